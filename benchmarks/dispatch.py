@@ -0,0 +1,80 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Microbenchmark of the request dispatch of the resources: the work done
+    by Resource.get_data before the request reaches DiscogsBase.get_data,
+    i.e. the category check and the building of the path. The Discogs
+    instance is replaced by a stand-in answering immediately, so only the
+    dispatch is measured.
+    With --max-us it exits with an error when a call takes longer, so it
+    can guard the dispatch overhead, e.g. in CI.
+
+    Usage:
+        python benchmarks/dispatch.py [iterations] [--max-us US]
+"""
+
+import optparse
+import os
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from discogsapi.resource.database.artist import ArtistsResource
+
+DATA = {'id': 45}
+
+
+class StandIn(object):
+    """ Stands for a Discogs instance, without any request.
+    """
+    compact = False
+
+    def get_data(self, path, params=None):
+        return DATA
+
+
+CASES = (
+    ('no subpath', None),
+    ('int id', 45),
+    ('str id', '45'),
+    ('tuple', ('45', 'releases')),
+)
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options] [iterations]')
+    parser.add_option('--max-us', type='float',
+                      help='fail if a call takes more than US microseconds')
+    options, args = parser.parse_args()
+    iterations = int(args[0]) if args else 100000
+    resource = ArtistsResource(StandIn())
+    slowest = 0
+    print '%-12s %12s' % ('subpath', 'us/call')
+    for name, subpath in CASES:
+        call = lambda: resource.get_data(subpath)
+        seconds = min(timeit.repeat(call, number=iterations, repeat=3))
+        us = seconds / iterations * 1e6
+        slowest = max(slowest, us)
+        print '%-12s %12.3f' % (name, us)
+    if options.max_us is not None and slowest > options.max_us:
+        sys.exit('dispatch takes %.3f us, more than %.3f us' %
+                 (slowest, options.max_us))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Benchmark of the cold start of the wrapper: the time to import
+    discogsapi, to create a Discogs instance and to access its first
+    resource, each one measured in a new interpreter, along with the number
+    of modules loaded by the import.
+    With --max-ms or --max-modules it exits with an error when the import
+    goes over the limits, so it can guard the import time, e.g. in CI.
+
+    Usage:
+        python benchmarks/import_time.py [--runs N] [--max-ms MS]
+                                         [--max-modules N]
+"""
+
+import json
+import optparse
+import os
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# Runs in a new interpreter and prints the timings as JSON
+SCRIPT = """
+import sys, time, json
+sys.path.insert(0, %r)
+before = set(sys.modules)
+started = time.time()
+import discogsapi
+imported = time.time()
+discogs = discogsapi.Discogs('DiscogsApiBenchmarks/1.0')
+created = time.time()
+discogs.artists
+accessed = time.time()
+modules = [i for i in set(sys.modules) - before if sys.modules[i]]
+print json.dumps({'import_ms': (imported - started) * 1000,
+                  'create_ms': (created - imported) * 1000,
+                  'first_resource_ms': (accessed - created) * 1000,
+                  'modules': len(modules)})
+""" % ROOT
+
+
+def measure(runs):
+    results = []
+    for i in xrange(runs):
+        output = subprocess.check_output([sys.executable, '-c', SCRIPT])
+        results.append(json.loads(output))
+    return results
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--runs', type='int', default=20,
+                      help='number of interpreters started')
+    parser.add_option('--max-ms', type='float',
+                      help='fail if the median import time is above MS')
+    parser.add_option('--max-modules', type='int',
+                      help='fail if the import loads more than N modules')
+    options, args = parser.parse_args()
+    results = measure(options.runs)
+    print '%-20s %10s %10s' % ('', 'min', 'median')
+    for key in ('import_ms', 'create_ms', 'first_resource_ms'):
+        values = [i[key] for i in results]
+        print '%-20s %10.2f %10.2f' % (key, min(values), median(values))
+    modules = max(i['modules'] for i in results)
+    print '%-20s %10d' % ('modules', modules)
+    import_ms = median([i['import_ms'] for i in results])
+    if options.max_ms is not None and import_ms > options.max_ms:
+        sys.exit('import takes %.2f ms, more than %.2f ms' %
+                 (import_ms, options.max_ms))
+    if options.max_modules is not None and modules > options.max_modules:
+        sys.exit('import loads %d modules, more than %d' %
+                 (modules, options.max_modules))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Microbenchmark of the JSON decoders supported by DiscogsBase, decoding
+    the Discogs payloads of the payloads directory.
+
+    Usage:
+        python benchmarks/json_decoding.py [iterations]
+"""
+
+import json
+import os
+import sys
+import timeit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from discogsapi.decoders import DECODERS, _load
+
+PAYLOADS_DIR = os.path.join(HERE, 'payloads')
+
+
+def load_payloads():
+    """ Returns a list of (name, body) with the payloads, serialized compact
+    as the Discogs API sends them.
+    """
+    payloads = []
+    for filename in sorted(os.listdir(PAYLOADS_DIR)):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(PAYLOADS_DIR, filename)) as afile:
+            data = json.load(afile)
+        body = json.dumps(data, separators=(',', ':'), ensure_ascii=False)
+        payloads.append((filename[:-5], body.encode('utf-8')))
+    return payloads
+
+
+def main(iterations=1000):
+    decoders = [(name, _load(name)) for name in DECODERS]
+    decoders = [(name, loads) for name, loads in decoders if loads]
+    print 'Decoders installed: %s' % ', '.join(i[0] for i in decoders)
+    print '%-18s %-12s %10s %12s %10s' % ('payload', 'decoder', 'bytes',
+                                          'us/decode', 'MB/s')
+    for name, body in load_payloads():
+        for decoder, loads in decoders:
+            seconds = min(timeit.repeat(lambda: loads(body), number=iterations,
+                                        repeat=3)) / iterations
+            print '%-18s %-12s %10d %12.1f %10.1f' % (
+                name, decoder, len(body), seconds * 1e6,
+                len(body) / seconds / 1e6)
+
+
+if __name__ == '__main__':
+    main(*[int(i) for i in sys.argv[1:2]])
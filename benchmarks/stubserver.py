@@ -0,0 +1,201 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" A local stand-in of the Discogs API, serving the payloads of the
+    payloads directory, for the offline benchmarks.
+
+    It serves:
+        /artists/<id>                   artist.json
+        /artists/<id>/releases          pages of artist_releases.json items
+        /releases/<id>, /masters/<id>   release.json
+        /labels/<id>                    a small label
+        /users/<username>/inventory     pages of inventory.json items
+        /image/<filename>               image_size bytes of image data
+    Every response waits latency seconds before being sent, and JSON bodies
+    are gzip compressed when the client accepts it.
+
+    Usage:
+        python benchmarks/stubserver.py [port] [latency]
+"""
+
+import BaseHTTPServer
+import gzip
+import json
+import os
+import re
+import SocketServer
+import sys
+import threading
+import time
+import urlparse
+from StringIO import StringIO
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+PAYLOADS_DIR = os.path.join(HERE, 'payloads')
+API_URL = 'http://api.discogs.com'
+
+
+def load_payload(name):
+    with open(os.path.join(PAYLOADS_DIR, '%s.json' % name)) as afile:
+        return json.load(afile)
+
+
+class StubHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in a single segment, without waiting for the
+    # delayed ACK of the client
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    ROUTES = (
+        (re.compile(r'^/artists/(\d+)/releases$'), 'artist_releases'),
+        (re.compile(r'^/artists/(\d+)$'), 'artist'),
+        (re.compile(r'^/(?:releases|masters)/(\d+)$'), 'release'),
+        (re.compile(r'^/labels/(\d+)$'), 'label'),
+        (re.compile(r'^/users/([^/]+)/inventory$'), 'inventory'),
+        (re.compile(r'^/image/(.+)$'), 'image'),
+    )
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        server.count()
+        if server.latency:
+            time.sleep(server.latency)
+        parsed = urlparse.urlparse(self.path)
+        params = dict(urlparse.parse_qsl(parsed.query))
+        for regexp, name in self.ROUTES:
+            match = regexp.match(parsed.path)
+            if match:
+                return getattr(self, name)(match.group(1), params)
+        self.send_json({'message': 'The requested resource was not found.'},
+                       404)
+
+    def send_body(self, body, content_type, status=200):
+        encoding = None
+        if content_type == 'application/json' and \
+           'gzip' in self.headers.get('Accept-Encoding', ''):
+            buf = StringIO()
+            with gzip.GzipFile(fileobj=buf, mode='wb') as afile:
+                afile.write(body)
+            body = buf.getvalue()
+            encoding = 'gzip'
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, separators=(',', ':'))
+        body = body.replace(API_URL, self.server.url)
+        self.send_body(body, 'application/json', status)
+
+    def send_page(self, path, key, items, params):
+        per_page = int(params.get('per_page', 50))
+        page = int(params.get('page', 1))
+        pages = max((len(items) + per_page - 1) // per_page, 1)
+        if page > pages:
+            return self.send_json({'message': 'Page not found'}, 404)
+        urls = {}
+        url = '%s%s?per_page=%d&page=%%d' % (API_URL, path, per_page)
+        if page > 1:
+            urls.update(first=url % 1, prev=url % (page - 1))
+        if page < pages:
+            urls.update(next=url % (page + 1), last=url % pages)
+        start = (page - 1) * per_page
+        self.send_json({
+            'pagination': dict(page=page, pages=pages, per_page=per_page,
+                               items=len(items), urls=urls),
+            key: items[start:start + per_page],
+        })
+
+    def artist(self, id, params):
+        self.send_json(dict(self.server.payloads['artist'], id=int(id)))
+
+    def release(self, id, params):
+        self.send_json(dict(self.server.payloads['release'], id=int(id)))
+
+    def label(self, id, params):
+        self.send_json({'id': int(id), 'name': "Groovin' Records",
+                        'profile': '', 'images': [],
+                        'resource_url': '%s/labels/%s' % (API_URL, id)})
+
+    def artist_releases(self, id, params):
+        self.send_page('/artists/%s/releases' % id, 'releases',
+                       self.server.releases, params)
+
+    def inventory(self, username, params):
+        self.send_page('/users/%s/inventory' % username, 'listings',
+                       self.server.listings, params)
+
+    def image(self, filename, params):
+        self.send_body(self.server.image_data, 'image/jpeg')
+
+
+class StubServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """ The Discogs API stand-in. items is the number of items of the
+    paginated resources and image_size the size of the images served.
+    start runs it in a background thread.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, latency=0.0, items=230, image_size=30000):
+        BaseHTTPServer.HTTPServer.__init__(self, ('127.0.0.1', port),
+                                           StubHandler)
+        self.url = 'http://127.0.0.1:%d' % self.server_port
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        self.payloads = dict((name, load_payload(name)) for name in
+                             ('artist', 'release', 'artist_releases',
+                              'inventory'))
+        releases = self.payloads['artist_releases']['releases']
+        listings = self.payloads['inventory']['listings']
+        self.releases = [releases[i % len(releases)] for i in xrange(items)]
+        self.listings = [listings[i % len(listings)] for i in xrange(items)]
+        self.image_data = ''.join(chr(i % 256) for i in xrange(image_size))
+
+    def handle_error(self, request, client_address):
+        # The clients drop their pooled connections when they are done
+        pass
+
+    def count(self):
+        with self._lock:
+            self.requests += 1
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    server = StubServer(int(args[0]) if args else 8045,
+                        float(args[1]) if len(args) > 1 else 0.0)
+    print 'Discogs API stand-in running on %s' % server.url
+    server.serve_forever()
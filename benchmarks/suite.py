@@ -0,0 +1,205 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Offline benchmark suite of the wrapper, run against the local stand-in
+    of the Discogs API of stubserver.py, so that the numbers do not depend
+    on the network nor consume the Discogs rate limit.
+
+    It measures:
+        requests     requests/s and p50/p99 latency of sequential gets, and
+                     requests/s of concurrent gets through get_many
+        pagination   items/s iterating an artist's releases, with and
+                     without prefetching of the next pages
+        entities     construction and attribute access cost of Release and
+                     of CompactRelease
+        images       bytes/s downloading images
+
+    The results can be saved with --json and compared with a previous run
+    with --compare, to check a change for regressions:
+
+        python benchmarks/suite.py --json before.json
+        (apply the change)
+        python benchmarks/suite.py --compare before.json
+
+    Usage:
+        python benchmarks/suite.py [--latency SECONDS] [--quick]
+                                   [--json FILE] [--compare FILE]
+"""
+
+import json
+import optparse
+import os
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from discogsapi import Discogs
+from discogsapi.ratelimit import RateLimit
+from discogsapi.resource.compact import CompactRelease
+from discogsapi.resource.database.release import Release
+from stubserver import StubServer, load_payload
+
+USER_AGENT = 'DiscogsApiBenchmarks/1.0'
+
+# Metrics where a smaller value is better, the others are throughputs
+LOWER_IS_BETTER = ('p50_ms', 'p99_ms', 'us')
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = int(round(percent / 100.0 * (len(values) - 1)))
+    return values[index]
+
+
+def bench_requests(url, count):
+    discogs = Discogs(USER_AGENT, base_url=url)
+    latencies = []
+    started = time.time()
+    for i in xrange(count):
+        start = time.time()
+        discogs.releases.get(i + 1)
+        latencies.append(time.time() - start)
+    seconds = time.time() - started
+    discogs.transport.clear()
+    results = {
+        'sequential_rps': count / seconds,
+        'sequential_p50_ms': percentile(latencies, 50) * 1000,
+        'sequential_p99_ms': percentile(latencies, 99) * 1000,
+    }
+    discogs = Discogs(USER_AGENT, base_url=url, pool_size=8)
+    started = time.time()
+    list(discogs.releases.get_many(range(1, count + 1), concurrency=8))
+    results['get_many_rps'] = count / (time.time() - started)
+    discogs.transport.clear()
+    return results
+
+
+def bench_pagination(url, rounds):
+    results = {}
+    for prefetch in (0, 2):
+        discogs = Discogs(USER_AGENT, base_url=url, prefetch=prefetch)
+        items = 0
+        started = time.time()
+        for i in xrange(rounds):
+            for release in discogs.artists.get_releases('45'):
+                items += 1
+        results['prefetch%d_items_per_s' % prefetch] = \
+            items / (time.time() - started)
+        discogs.transport.clear()
+    return results
+
+
+def bench_entities(count):
+    data = load_payload('release')
+
+    class Stub(object):
+        pass
+
+    resource = Stub()
+    results = {}
+    for name, cls in (('release', Release), ('compact_release',
+                                             CompactRelease)):
+        started = time.time()
+        for i in xrange(count):
+            entity = cls(resource, data)
+            entity.title, entity.year, entity.tracklist
+        results['%s_us' % name] = (time.time() - started) / count * 1e6
+    return results
+
+
+def bench_images(url, count):
+    discogs = Discogs(USER_AGENT, base_url=url)
+    size = 0
+    started = time.time()
+    for i in xrange(count):
+        size += len(discogs.images.get('R-%d.jpeg' % i).content)
+    results = {'bytes_per_s': size / (time.time() - started)}
+    discogs.transport.clear()
+    return results
+
+
+def run(latency=0.0, quick=False):
+    # The image downloads count in the rate limit shared by the processes
+    # of the machine, use a private counter for the benchmarks
+    RateLimit.RATE_LIMIT_LOCK_FILE = 'discogs_benchmarks_%d.counter' % \
+                                     os.getpid()
+    RateLimit.RATE_LIMIT = sys.maxint
+    factor = 10 if quick else 1
+    server = StubServer(latency=latency).start()
+    try:
+        return {
+            'requests': bench_requests(server.url, 500 / factor),
+            'pagination': bench_pagination(server.url, 20 / factor),
+            'entities': bench_entities(20000 / factor),
+            'images': bench_images(server.url, 200 / factor),
+        }
+    finally:
+        server.stop()
+        path = os.path.join(tempfile.gettempdir(),
+                            RateLimit.RATE_LIMIT_LOCK_FILE)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def lower_is_better(metric):
+    return any(metric.endswith(i) for i in LOWER_IS_BETTER)
+
+
+def report(results, baseline=None):
+    baseline = baseline or {}
+    for group in sorted(results):
+        print group
+        for metric in sorted(results[group]):
+            value = results[group][metric]
+            line = '    %-28s %14.1f' % (metric, value)
+            before = baseline.get(group, {}).get(metric)
+            if before:
+                change = (value - before) / before * 100
+                if lower_is_better(metric):
+                    change = -change
+                line += ' %14.1f %+8.1f%%' % (before, change)
+            print line
+
+
+def main():
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--latency', type='float', default=0.0,
+                      help='seconds the stand-in waits before responding')
+    parser.add_option('--quick', action='store_true',
+                      help='run a tenth of the iterations')
+    parser.add_option('--json', metavar='FILE',
+                      help='save the results as JSON in FILE')
+    parser.add_option('--compare', metavar='FILE',
+                      help='compare with the results saved in FILE, '
+                           'positive changes are improvements')
+    options, args = parser.parse_args()
+    results = run(options.latency, options.quick)
+    baseline = None
+    if options.compare:
+        with open(options.compare) as afile:
+            baseline = json.load(afile)
+    report(results, baseline)
+    if options.json:
+        with open(options.json, 'w') as afile:
+            json.dump(results, afile, indent=4, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
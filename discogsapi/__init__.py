@@ -15,5 +15,6 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 from discogsapi.discogs import Discogs
+from discogsapi.asyncdiscogs import AsyncDiscogs
 
 __version__ = '0.0.1'
\ No newline at end of file
@@ -0,0 +1,151 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Asynchronous flavour of the Discogs API Python Wrapper.
+    The requests run in a pool of worker threads, so many of them can be in
+    flight at the same time, while the results are the same EntityResources
+    (Artist, Release, Image...) returned by the Discogs class.
+"""
+
+from discogsapi.discogs import Discogs
+
+
+def _call(func, args, kwargs):
+    """ Calls func in a worker thread. A generator requests nothing until
+    it is used, so its first page is requested here, in the worker.
+    """
+    # the resources, loaded on first access, have imported it already
+    from discogsapi.resource.entity import EntityResourceGenerator
+    result = func(*args, **kwargs)
+    if isinstance(result, EntityResourceGenerator):
+        result._start()
+    return result
+
+
+class AsyncResource(object):
+    """ Wraps a Resource of an AsyncDiscogs instance. Calling any public
+    method of the wrapped resource, e.g. get(id), schedules the call in the
+    worker pool and returns immediately a multiprocessing.pool.AsyncResult.
+    The actual value is retrieved with its get([timeout]) method, while
+    ready() and wait([timeout]) tell whether the call has finished.
+    A generator, e.g. the one of get_releases(id), is returned once its
+    first page is fetched.
+    """
+
+    def __init__(self, discogs, resource):
+        self.discogs = discogs
+        self.resource = resource
+
+    def __unicode__(self):
+        return u'Async %s' % self.resource.__unicode__()
+
+    def __str__(self):
+        return self.__unicode__().encode('utf-8')
+
+    def __repr__(self):
+        return "<%s>" % self.__str__()
+
+    def __getattr__(self, name):
+        attr = getattr(self.resource, name)
+        if name.startswith('_') or not callable(attr):
+            return attr
+        def method(*args, **kwargs):
+            return self.discogs.apply_async(_call, (attr, args, kwargs))
+        method.__name__ = name
+        method.__doc__ = attr.__doc__
+        return method
+
+
+class AsyncDiscogs(Discogs):
+    """ Asynchronous version of the Discogs class. It has the same resources,
+    but each resource call returns an AsyncResult instead of blocking until
+    the response arrives:
+
+    >>> from discogsapi import AsyncDiscogs
+    >>> discogs = AsyncDiscogs("HeyBaldock/1.0 +http://heybaldock.com.br")
+    >>> artist = discogs.artists.get(45)
+    >>> release = discogs.releases.get(45)
+    >>> artist.get()
+    <Artist: Aphex Twin>
+    >>> release.get()
+    <Release: Push Along EP>
+    >>> discogs.gather([discogs.masters.get(8471), discogs.labels.get(45)])
+    [<Master: Back In Black>, <Label: Groovin' Records>]
+    >>> discogs.close()
+
+    The argument workers is the number of requests that can run at the same
+    time. Unless pool_size is given, the connection pool keeps one idle
+    connection per worker.
+    The generators, e.g. artists.get_releases(id), are returned with their
+    first page fetched, and fetch their next pages in background (see
+    EntityResourceGenerator), DEFAULT_PREFETCH pages ahead unless the
+    argument prefetch says otherwise.
+    """
+
+    DEFAULT_WORKERS = 10
+    DEFAULT_PREFETCH = 2
+
+    def __init__(self, user_agent, workers=None, **kwargs):
+        workers = workers or self.DEFAULT_WORKERS
+        kwargs.setdefault('pool_size', workers)
+        kwargs.setdefault('prefetch', self.DEFAULT_PREFETCH)
+        super(AsyncDiscogs, self).__init__(user_agent, **kwargs)
+        # imported here, so importing discogsapi doesn't load
+        # multiprocessing, which is slow to import
+        from multiprocessing.pool import ThreadPool
+        self.workers = workers
+        self.worker_pool = ThreadPool(workers)
+        self._async_resources = {}
+
+    def public_resource(self, resource):
+        """ The resources are wrapped in AsyncResources.
+        """
+        wrapper = self._async_resources.get(resource)
+        if wrapper is None:
+            wrapper = self._async_resources.setdefault(
+                resource, AsyncResource(self, resource))
+        return wrapper
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def apply_async(self, func, args=(), kwargs=None, callback=None):
+        """ Schedules func(*args, **kwargs) in the worker pool and returns
+        an AsyncResult.
+        """
+        return self.worker_pool.apply_async(func, args, kwargs or {},
+                                            callback)
+
+    def gather(self, results, timeout=None):
+        """ Waits for a list of AsyncResults and returns their values in the
+        same order. The first exception raised by a call is re-raised here.
+        """
+        return [result.get(timeout) for result in results]
+
+    def close(self):
+        """ Waits for the scheduled calls and stops the worker threads.
+        """
+        self.worker_pool.close()
+        self.worker_pool.join()
+        self.transport.clear()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -19,23 +19,71 @@
     the Discogs API.
 """
 
+import sys
+import threading
+import time
 import urllib
 import urllib2
-from simplejson import loads
+from StringIO import StringIO
+
+from discogsapi.cache import CacheEntry
+from discogsapi.connection import ConnectionPool
+from discogsapi.decoders import get_decoder
+from discogsapi.metrics import RequestEvent
+from discogsapi.retry import Retry
 
 
 class DiscogsException(Exception):
     pass
 
 
+class _Flight(object):
+    """ A get_data call in progress, waited by the concurrent calls of the
+    same request.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data = None
+        self.exc_info = None
+
+    def wait(self):
+        self.done.wait()
+        if self.exc_info:
+            exc_info = self.exc_info
+            raise exc_info[0], exc_info[1], exc_info[2]
+        return self.data
+
+
 class DiscogsBase(object):
     """ This is the base class for Discogs API.
         Contains the basic methods for HTTP requests to the Discogs API.
     """
 
     BASE_URL = 'http://api.discogs.com'
+    REDIRECT_CODES = (301, 302, 303, 307)
+    NOT_MODIFIED = 304
+    MAX_REDIRECTS = 5
+    # transport used by the instances created without one, e.g. a
+    # CassetteTransport set by a test suite
+    default_transport = None
+    DEFAULT_CACHE_TTL = 60 * 60
+    # ttls in seconds by resource name, 0 disables the cache for the resource
+    CACHE_TTLS = {
+        'releases': 7 * 24 * 60 * 60,
+        'masters': 7 * 24 * 60 * 60,
+        'artists': 24 * 60 * 60,
+        'labels': 24 * 60 * 60,
+        'search': 5 * 60,
+        'users': 5 * 60,
+        'marketplace': 0,
+    }
 
-    def __init__(self, user_agent):
+    def __init__(self, user_agent, pool_size=None, timeout=None, prefetch=0,
+                 cache=None, cache_ttls=None, rate_limiter=None,
+                 compact=False, json_decoder=None, compress=True,
+                 base_url=None, transport=None, hooks=None, retry=None,
+                 coalesce=True):
         """ The argument user_agent is required. Discogs API will block ips
         from requests with bad user_agent names.
         See the advise below from www.discogs.com/developers/accessing.html:
@@ -56,24 +104,234 @@ class DiscogsBase(object):
             Mozilla/5.0 (X11; Linux i686; rv:6.0.2) Gecko/20100101 Firefox/6.0
             my app
         "
+
+        All the requests go through a pool of keep-alive connections,
+        shared by all the resources of this instance. The argument pool_size
+        is the maximum number of idle connections kept for each host and
+        timeout is the socket timeout in seconds.
+        The argument transport replaces that connection pool by another
+        transport, e.g. a MemoryTransport or a CassetteTransport replaying
+        recorded responses, see the transport module.
+        The argument prefetch is the default number of pages the paginated
+        resources (EntityResourceGenerator) fetch ahead in background.
+        The argument cache is an optional BaseCache instance, e.g. a
+        MemoryCache or a persistent SQLiteCache, used by get_data (and so by
+        all the resources) to avoid requesting the same data again. Expired
+        entries are revalidated with conditional GETs. The cache_ttls dict
+        overrides the CACHE_TTLS of the resources.
+        The argument rate_limiter is an optional limiter, e.g. a TokenBucket,
+        which is acquired before every request sent to the API, by all the
+        resources of this instance. E.g. TokenBucket(60, 60) follows the
+        Discogs limit of 60 requests per minute for authenticated clients.
+        With compact=True, the resources return compact entities (see the
+        resource.compact module), __slots__ based structs taking much less
+        memory, with the same attributes of the regular entities.
+        The argument json_decoder names the JSON library used to decode the
+        responses: 'orjson', 'simplejson' or 'json'. By default, or if it
+        isn't installed, the first installed one of these is used, see the
+        decoders module.
+        With compress=True the responses are requested gzip or deflate
+        compressed, and decompressed while they are read. The transfer
+        attribute counts the bytes received over the wire and after the
+        decompression.
+        The argument base_url replaces BASE_URL, e.g. to use a local stand-in
+        of the Discogs API.
+        The argument hooks is a list of callables, called with a
+        RequestEvent (see the metrics module) when each request is done,
+        e.g. a MetricsAggregator. More hooks can be added with add_hook.
+        The argument retry is the Retry policy for the requests failing with
+        a 429 or 5xx response or a network error, a default Retry() if not
+        given; Retry(total=0) disables the retries. After a 429 response the
+        rate_limiter, if it has a penalize method, is held back for the
+        delay of the retry, so the other requests slow down as well.
+        With coalesce=True, concurrent get_data calls of the same path and
+        params share a single request: the first one sends it, the others
+        wait for it and get the same decoded data (or exception). So the
+        data returned by get_data must not be modified in place.
         """
         self.user_agent = user_agent
+        if base_url:
+            self.BASE_URL = base_url.rstrip('/')
+        self.transport = transport or self.default_transport or \
+                         ConnectionPool(pool_size, timeout)
+        self.transfer = self.transport.transfer
+        self.compress = compress
+        self.prefetch = prefetch
+        self.cache = cache
+        self.cache_ttls = dict(self.CACHE_TTLS, **(cache_ttls or {}))
+        self.rate_limiter = rate_limiter
+        self.compact = compact
+        self._json_decoder = json_decoder
+        self._decoder = None
+        self.hooks = list(hooks or [])
+        self.retry = retry if retry is not None else Retry()
+        self.coalesce = coalesce
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._resources = {}
+        self._resources_lock = threading.Lock()
+
+    @property
+    def json_decoder(self):
+        """ The name of the JSON library decoding the responses, imported
+        only when the first response is decoded.
+        """
+        if self._decoder is None:
+            self._decoder = get_decoder(self._json_decoder)
+        return self._decoder[0]
 
-    def get_response(self, path, params=None):
-        """ Returns an addinfourl object response.
+    @property
+    def loads(self):
+        if self._decoder is None:
+            self._decoder = get_decoder(self._json_decoder)
+        return self._decoder[1]
+
+    def get_resource(self, resource_class):
+        """ Returns the instance of resource_class bound to this Discogs
+        instance. There's a single instance of each resource class per
+        Discogs instance, shared by all the entities.
+        """
+        resource = self._resources.get(resource_class)
+        if resource is None:
+            with self._resources_lock:
+                resource = self._resources.get(resource_class)
+                if resource is None:
+                    resource = resource_class(self)
+                    self._resources[resource_class] = resource
+        return resource
+
+    def add_hook(self, hook):
+        """ Adds a callable called with the RequestEvent of every request.
+        The hooks run in the thread of the request, so they must be quick
+        and thread-safe.
+        """
+        # the list is replaced, not changed, as requests may be iterating it
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        self.hooks = [i for i in self.hooks if i is not hook]
+
+    def _fire(self, event):
+        event.finish()
+        for hook in self.hooks:
+            hook(event)
+
+    def cache_key(self, path, params=None):
+        """ Returns the cache key of a request, the path followed by its
+        params sorted by name.
+
+        >>> base = DiscogsBase("HeyBaldock/1.0 +http://heybaldock.com.br")
+        >>> base.cache_key('/artists/45/releases', {'per_page': 20, 'page': 2})
+        '/artists/45/releases?page=2&per_page=20'
+        """
+        if not params:
+            return path
+        return "%s?%s" % (path, urllib.urlencode(sorted(params.items())))
+
+    def cache_ttl(self, path):
+        """ Returns the cache ttl in seconds for the resource of the path.
+
+        >>> base = DiscogsBase("HeyBaldock/1.0 +http://heybaldock.com.br")
+        >>> base.cache_ttl('/search')
+        300
+        """
+        name = path.split('/', 2)[1]
+        return self.cache_ttls.get(name, self.DEFAULT_CACHE_TTL)
+
+    def get_response(self, path, params=None, headers=None):
+        """ Returns a PooledResponse object, a file-like object response
+        with the interface of the urllib2 responses: read, readline,
+        readlines, the iteration over the lines, code, info and geturl.
         path examples:
             /artists/45
             /artists/45/releases
             /masters/999
+        The optional headers are sent along with the User-Agent. A 304
+        response, to a conditional GET, is returned as is.
+        The RequestEvent fired to the hooks counts the bytes given by the
+        Content-Length header, since the body isn't read yet.
+        """
+        event = RequestEvent(path, params) if self.hooks else None
+        try:
+            response = self._request(path, params, headers, event)
+        except Exception, err:
+            if event is not None:
+                event.error = err
+                self._fire(event)
+            raise
+        if event is not None:
+            length = response.getheader('content-length') or ''
+            if length.isdigit():
+                event.wire_bytes = int(length)
+            self._fire(event)
+        return response
+
+    def _request(self, path, params=None, headers=None, event=None):
+        """ Sends the request, retrying it as the retry policy says, and
+        returns the response. The details are set in event, if given.
         """
         url = "%s%s" % (self.BASE_URL, path)
-        opener = urllib2.build_opener(urllib2.HTTPHandler)
-        request = urllib2.Request(url)
-        request.add_header('User-Agent', self.user_agent)
-        request.get_method = lambda: 'GET'
         if params:
-            request.add_data(urllib.urlencode(params))
-        response = opener.open(request)
+            url = "%s?%s" % (url, urllib.urlencode(params))
+        headers = dict(headers or {}, **{'User-Agent': self.user_agent})
+        if self.compress:
+            headers['Accept-Encoding'] = 'gzip, deflate'
+        retry = self.retry
+        started = time.time()
+        attempt = 0
+        while True:
+            try:
+                response = self._send(url, headers, event)
+            except retry.ERRORS:
+                delay = retry.delay(attempt, started)
+                if delay is None:
+                    raise
+            else:
+                if response.status not in retry.statuses:
+                    break
+                delay = retry.delay(attempt, started,
+                                    response.getheader('retry-after'))
+                if delay is None:
+                    break
+                response.read()
+                if response.status == retry.TOO_MANY_REQUESTS:
+                    self._penalize(delay)
+            attempt += 1
+            if event is not None:
+                event.retries += 1
+            time.sleep(delay)
+        if response.status >= 300 and response.status != self.NOT_MODIFIED:
+            body = response.read()
+            raise urllib2.HTTPError(response.geturl(), response.status,
+                                    response.reason, response.msg,
+                                    StringIO(body))
+        return response
+
+    def _penalize(self, seconds):
+        penalize = getattr(self.rate_limiter, 'penalize', None)
+        if penalize is not None:
+            penalize(seconds)
+
+    def _send(self, url, headers, event=None):
+        """ Sends the request once, following the redirects, and returns
+        the response.
+        """
+        for i in range(self.MAX_REDIRECTS + 1):
+            if self.rate_limiter is not None:
+                start = time.time()
+                self.rate_limiter.acquire()
+                if event is not None:
+                    event.rate_limit_wait += time.time() - start
+            if event is not None:
+                event.url = url
+            response = self.transport.urlopen('GET', url, headers)
+            if event is not None:
+                event.status = response.status
+            location = response.getheader('location')
+            if response.status not in self.REDIRECT_CODES or not location:
+                break
+            response.read()
+            url = urllib2.urlparse.urljoin(url, location)
         return response
 
     def get_data(self, path, params=None):
@@ -83,9 +341,78 @@ class DiscogsBase(object):
             /artists/45/releases
             /masters/999
         """
-        response = self.get_response(path, params=params)
-        info = loads(response.read())
-        return info
+        event = RequestEvent(path, params) if self.hooks else None
+        try:
+            data = self._get_data_once(path, params, event)
+        except Exception, err:
+            if event is not None:
+                event.error = err
+                self._fire(event)
+            raise
+        if event is not None:
+            self._fire(event)
+        return data
+
+    def _get_data_once(self, path, params, event):
+        """ Runs _get_data, unless the same request is already in flight in
+        another thread, in which case its result is waited and shared.
+        """
+        if not self.coalesce:
+            return self._get_data(path, params, event)
+        key = self.cache_key(path, params)
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            if event is not None:
+                event.coalesced = True
+            return flight.wait()
+        try:
+            flight.data = self._get_data(path, params, event)
+        except Exception:
+            flight.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.data
+
+    def _read(self, response, event):
+        body = response.read()
+        if event is not None:
+            event.wire_bytes = response.wire_bytes
+            event.decoded_bytes = response.decoded_bytes
+        return body
+
+    def _get_data(self, path, params, event):
+        ttl = self.cache_ttl(path) if self.cache is not None else 0
+        if ttl <= 0:
+            response = self._request(path, params, event=event)
+            return self.loads(self._read(response, event))
+        key = self.cache_key(path, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.fresh:
+            if event is not None:
+                event.cache = 'hit'
+            return self.loads(entry.body)
+        if event is not None:
+            event.cache = 'miss'
+        headers = entry.validators() if entry is not None else None
+        response = self._request(path, params, headers, event)
+        body = self._read(response, event)
+        expires = time.time() + ttl
+        if response.status == self.NOT_MODIFIED:
+            self.cache.touch(key, expires)
+            if event is not None:
+                event.cache = 'revalidated'
+            return self.loads(entry.body)
+        self.cache.set(key, CacheEntry(body, expires,
+                                       response.getheader('etag'),
+                                       response.getheader('last-modified')))
+        return self.loads(body)
 
     def get_data_from_full_url(self, url):
         """ Returns a dict, parsed once through a json string.
@@ -95,3 +422,8 @@ class DiscogsBase(object):
         p = urllib2.urlparse.urlparse(url)
         params = dict(urllib2.urlparse.parse_qsl(p.query))
         return self.get_data(p.path, params)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
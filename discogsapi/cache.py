@@ -0,0 +1,291 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Module for the response caches used by DiscogsBase.
+    A cache stores CacheEntry objects with the raw JSON bodies of the
+    responses, keyed on the path and the query params of the request. Each
+    entry expires after a ttl (in seconds) chosen by the Discogs instance for
+    the resource. Expired entries carrying an ETag or Last-Modified header
+    are revalidated with a conditional GET, so an unchanged resource costs a
+    304 response instead of the whole body.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry(object):
+    """ A cached response body, with its expiration timestamp and the
+    validators sent by the server.
+
+    >>> entry = CacheEntry('{}', time.time() - 1, etag='"abc"')
+    >>> entry.fresh
+    False
+    >>> entry.validators()
+    {'If-None-Match': '"abc"'}
+    """
+
+    def __init__(self, body, expires, etag=None, last_modified=None):
+        self.body = body
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+
+    @property
+    def fresh(self):
+        return self.expires > time.time()
+
+    def validators(self):
+        """ Returns the headers for a conditional GET of this entry.
+        """
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class BaseCache(object):
+    """ Base class for the caches. Subclasses must implement the _get, _set,
+    _touch, delete and clear methods. The counters are updated here:
+        hits: fresh entries found
+        misses: keys not found
+        stale: expired entries found, to be revalidated or fetched again
+        revalidated: stale entries confirmed by a 304 response
+    The caches are shared by the threads of a Discogs instance, so the
+    subclasses must be thread-safe.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+        self._counters_lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def get(self, key):
+        """ Returns the CacheEntry of key, even if expired, or None.
+        """
+        entry = self._get(key)
+        if entry is None:
+            self._count('misses')
+        elif entry.fresh:
+            self._count('hits')
+        else:
+            self._count('stale')
+        return entry
+
+    def set(self, key, entry):
+        self._set(key, entry)
+
+    def touch(self, key, expires):
+        """ Renews the expiration of an entry after a revalidation.
+        """
+        self._count('revalidated')
+        self._touch(key, expires)
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, entry):
+        raise NotImplementedError
+
+    def _touch(self, key, expires):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return dict(hits=self.hits, misses=self.misses, stale=self.stale,
+                    revalidated=self.revalidated)
+
+
+class MemoryCache(BaseCache):
+    """ A thread-safe in-process cache, bounded to max_entries entries.
+    When it is full, the least recently used entry is evicted.
+
+    >>> cache = MemoryCache(max_entries=2)
+    >>> cache.set('/artists/45', CacheEntry('{"name": "Aphex Twin"}',
+    ...                                     time.time() + 60))
+    >>> cache.set('/labels/45', CacheEntry('{}', time.time() + 60))
+    >>> cache.get('/artists/45').body
+    '{"name": "Aphex Twin"}'
+    >>> cache.set('/masters/8471', CacheEntry('{}', time.time() + 60))
+    >>> cache.get('/labels/45') is None
+    True
+    >>> sorted(cache.stats().items())
+    [('entries', 2), ('evictions', 1), ('hits', 1), ('misses', 1), ('revalidated', 0), ('stale', 0)]
+    """
+
+    DEFAULT_MAX_ENTRIES = 1000
+
+    def __init__(self, max_entries=None):
+        super(MemoryCache, self).__init__()
+        self.max_entries = max_entries or self.DEFAULT_MAX_ENTRIES
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._entries[key] = entry
+            return entry
+
+    def _set(self, key, entry):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _touch(self, key, expires):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires = expires
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        stats = super(MemoryCache, self).stats()
+        stats.update(entries=len(self._entries), evictions=self.evictions)
+        return stats
+
+
+class SQLiteCache(BaseCache):
+    """ A persistent cache stored in a SQLite database file. It survives
+    restarts and can be shared by many processes (and threads) of the same
+    node, each one using its own SQLiteCache instance on the same path.
+    Expired entries are kept for revalidation until purge is called.
+
+    >>> import os
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'discogs.db')
+    >>> cache = SQLiteCache(path)
+    >>> cache.set('/artists/45', CacheEntry('{}', time.time() - 1,
+    ...                                     etag='"abc"'))
+    >>> entry = SQLiteCache(path).get('/artists/45')
+    >>> entry.fresh, entry.etag
+    (False, '"abc"')
+    >>> cache.touch('/artists/45', time.time() + 60)
+    >>> cache.get('/artists/45').fresh
+    True
+    >>> cache.purge(time.time() + 120)
+    1
+    >>> cache.get('/artists/45') is None
+    True
+    """
+
+    TIMEOUT = 30
+
+    def __init__(self, path):
+        super(SQLiteCache, self).__init__()
+        self.path = path
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('CREATE TABLE IF NOT EXISTS responses ('
+                           'key TEXT PRIMARY KEY, body BLOB, expires REAL, '
+                           'etag TEXT, last_modified TEXT)')
+        connection.commit()
+
+    def _connection(self):
+        """ sqlite3 connections can't be shared by threads, so each thread
+        has its own one.
+        """
+        # imported here, so the module doesn't load sqlite3 unless it's used
+        import sqlite3
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.TIMEOUT)
+            connection.text_factory = str
+            self._local.connection = connection
+        return connection
+
+    def _execute(self, sql, args=()):
+        connection = self._connection()
+        with connection:
+            return connection.execute(sql, args)
+
+    def __len__(self):
+        sql = 'SELECT COUNT(*) FROM responses'
+        return self._connection().execute(sql).fetchone()[0]
+
+    def _get(self, key):
+        sql = 'SELECT body, expires, etag, last_modified FROM responses '\
+              'WHERE key = ?'
+        row = self._connection().execute(sql, (key,)).fetchone()
+        if row is None:
+            return None
+        body, expires, etag, last_modified = row
+        return CacheEntry(str(body), expires, etag, last_modified)
+
+    def _set(self, key, entry):
+        import sqlite3
+        self._execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+                      (key, sqlite3.Binary(entry.body), entry.expires,
+                       entry.etag, entry.last_modified))
+
+    def _touch(self, key, expires):
+        self._execute('UPDATE responses SET expires = ? WHERE key = ?',
+                      (expires, key))
+
+    def delete(self, key):
+        self._execute('DELETE FROM responses WHERE key = ?', (key,))
+
+    def clear(self):
+        self._execute('DELETE FROM responses')
+
+    def purge(self, before=None):
+        """ Deletes the entries expired before the given timestamp (now by
+        default) and returns how many were deleted.
+        """
+        before = time.time() if before is None else before
+        cursor = self._execute('DELETE FROM responses WHERE expires < ?',
+                               (before,))
+        return cursor.rowcount
+
+    def stats(self):
+        stats = super(SQLiteCache, self).stats()
+        stats.update(entries=len(self))
+        return stats
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
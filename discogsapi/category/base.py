@@ -20,24 +20,32 @@ class CategoryException(Exception):
 
 
 class CategoryMetaclass(type):
+    """ Each subclass of Category is replaced by an instance of itself,
+    the category name, which is added to the registry once, when the class
+    is defined.
+
+    >>> from discogsapi.category.base import Category
+    >>> from discogsapi.category.categories import Database
+    >>> Database in Category.categories()
+    True
+    """
+    registry = []
+
     def __new__(cls, name, bases, dct):
         new_attrs = {}
         for attr, value in dct.items():
             if attr.startswith('__'):
                 new_attrs[attr] = value
                 continue
-        def categories():
-            import categories
-            g = lambda x: getattr(categories, x)
-            return [g(i) for i in dir(categories) if isinstance(g(i),
-                                                                Category)]
-        new_attrs['categories'] = staticmethod(categories)
+        registry = cls.registry
+        new_attrs['categories'] = staticmethod(lambda: list(registry))
         new_class = super(CategoryMetaclass, cls).__new__(cls, name, bases,
                                                           new_attrs)
         if name == 'Category':
             return new_class
-        else:
-            return new_class(dct['name'])
+        category = new_class(dct['name'])
+        registry.append(category)
+        return category
 
 
 class Category(str):
@@ -0,0 +1,382 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Module for the HTTP connection pool used by DiscogsBase.
+    It keeps persistent (keep-alive) connections grouped by host, so
+    consecutive requests to the Discogs API reuse the same TCP connection
+    instead of paying the connection setup for every call.
+    Compressed responses (gzip or deflate Content-Encoding) are decompressed
+    on the fly while they are read.
+"""
+
+import httplib
+import socket
+import threading
+import urlparse
+import zlib
+from Queue import Queue, Empty, Full
+
+
+class ConnectionPoolException(Exception):
+    pass
+
+
+class TransferStats(object):
+    """ Thread-safe counters of the bytes received by a ConnectionPool:
+    wire_bytes as they came over the network, possibly compressed, and
+    decoded_bytes after the decompression.
+
+    >>> stats = TransferStats()
+    >>> stats.add(100, 700)
+    >>> stats.ratio
+    7.0
+    """
+
+    def __init__(self):
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self._lock = threading.Lock()
+
+    def add(self, wire_bytes, decoded_bytes):
+        with self._lock:
+            self.wire_bytes += wire_bytes
+            self.decoded_bytes += decoded_bytes
+
+    @property
+    def ratio(self):
+        """ The compression ratio, decoded bytes per wire byte.
+        """
+        if not self.wire_bytes:
+            return 1.0
+        return float(self.decoded_bytes) / self.wire_bytes
+
+    def __unicode__(self):
+        return u'%s bytes received, %s bytes decoded' % (self.wire_bytes,
+                                                         self.decoded_bytes)
+
+    def __str__(self):
+        return self.__unicode__().encode('utf-8')
+
+
+class _Decompressor(object):
+    """ Decompresses a gzip or deflate body. Some servers send deflate
+    bodies without the zlib header, so a raw deflate stream is tried when
+    the data can't be decompressed before the first output, even if it
+    came in small chunks. eof is set once the stream is flushed.
+    """
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.eof = False
+        self._first = encoding == 'deflate'
+        self._head = ''
+        if encoding == 'deflate':
+            self._decompressobj = zlib.decompressobj()
+        else:
+            self._decompressobj = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    @property
+    def unconsumed_tail(self):
+        return self._decompressobj.unconsumed_tail
+
+    def decompress(self, data, max_length=0):
+        if not self._first:
+            return self._decompressobj.decompress(data, max_length)
+        # the data is kept until the header is consumed, to decompress it
+        # again as a raw deflate stream if the header is wrong
+        self._head += data
+        try:
+            decompressed = self._decompressobj.decompress(data, max_length)
+        except zlib.error:
+            head, self._head = self._head, ''
+            self._first = False
+            self._decompressobj = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressobj.decompress(head, max_length)
+        if decompressed:
+            self._first = False
+            self._head = ''
+        return decompressed
+
+    def flush(self):
+        if self.eof:
+            return ''
+        self.eof = True
+        return self._decompressobj.flush()
+
+
+class PooledResponse(object):
+    """ Wraps an httplib.HTTPResponse taken from a pooled connection.
+    The connection goes back to the pool as soon as the body is entirely
+    read. If the response is closed before that, the connection is dropped,
+    since it can't be reused with unread data in the socket.
+    It provides the same reading interface of the addinfourl objects
+    returned by urllib2: read, info, getcode and geturl.
+    A gzip or deflate body is decompressed as it is read, chunk by chunk, so
+    read returns the decoded data. wire_bytes and decoded_bytes count the
+    bytes read before and after the decompression.
+    Like addinfourl, it has the code attribute, readline, readlines and the
+    iteration over the lines of the body.
+    """
+
+    ENCODINGS = ('gzip', 'x-gzip', 'deflate')
+    LINE_CHUNK_SIZE = 8192
+
+    def __init__(self, pool, key, connection, response, url):
+        self.pool = pool
+        self.key = key
+        self.url = url
+        self._connection = connection
+        self._response = response
+        self.status = self.code = response.status
+        self.reason = response.reason
+        self.msg = response.msg
+        self.headers = response.msg
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        encoding = (response.getheader('content-encoding') or '').lower()
+        encoding = encoding.strip()
+        self._decompressor = None
+        self._buffer = ''
+        if encoding in self.ENCODINGS:
+            self._decompressor = _Decompressor(encoding.replace('x-', ''))
+
+    def _read(self, amt=None):
+        if amt is None:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        if self._response.isclosed():
+            self.release()
+        self.wire_bytes += len(data)
+        return data
+
+    def read(self, amt=None):
+        buffered = self._buffer
+        if not buffered:
+            return self._decoded(amt)
+        if amt is None:
+            self._buffer = ''
+            return buffered + self._decoded()
+        self._buffer = buffered[amt:]
+        return buffered[:amt]
+
+    def readline(self, limit=-1):
+        """ Returns the next line of the body, with its newline, or at most
+        limit bytes of it.
+        """
+        while '\n' not in self._buffer and \
+              (limit < 0 or len(self._buffer) < limit):
+            chunk = self._decoded(self.LINE_CHUNK_SIZE)
+            if not chunk:
+                break
+            self._buffer += chunk
+        end = self._buffer.find('\n') + 1 or len(self._buffer)
+        if limit >= 0:
+            end = min(end, limit)
+        line, self._buffer = self._buffer[:end], self._buffer[end:]
+        return line
+
+    def readlines(self, sizehint=0):
+        """ Returns the lines left in the body, or whole lines until about
+        sizehint bytes are read.
+        """
+        lines = []
+        size = 0
+        for line in self:
+            lines.append(line)
+            size += len(line)
+            if 0 < sizehint <= size:
+                break
+        return lines
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def _decoded(self, amt=None):
+        decompressor = self._decompressor
+        if decompressor is not None and decompressor.eof:
+            return ''
+        if decompressor is None:
+            data = self._read(amt)
+            wire_bytes = len(data)
+        elif amt is None:
+            wire = self._read()
+            data = decompressor.decompress(decompressor.unconsumed_tail +
+                                           wire) + decompressor.flush()
+            wire_bytes = len(wire)
+        else:
+            data = ''
+            wire_bytes = 0
+            while not data:
+                wire = decompressor.unconsumed_tail
+                if not wire:
+                    wire = self._read(amt)
+                    wire_bytes += len(wire)
+                if not wire:
+                    data = decompressor.flush()
+                    break
+                data = decompressor.decompress(wire, amt)
+        self.decoded_bytes += len(data)
+        self.pool.transfer.add(wire_bytes, len(data))
+        return data
+
+    def release(self):
+        """ Gives the connection back to the pool if it can be reused,
+        otherwise closes it.
+        """
+        connection = self._connection
+        if connection is None:
+            return
+        self._connection = None
+        if self._response.isclosed() and not self._response.will_close:
+            self.pool.put_connection(self.key, connection)
+        else:
+            connection.close()
+
+    def close(self):
+        self.release()
+        self._response.close()
+
+    def getheader(self, name, default=None):
+        return self._response.getheader(name, default)
+
+    def getcode(self):
+        return self.status
+
+    def info(self):
+        return self.msg
+
+    def geturl(self):
+        return self.url
+
+
+class ConnectionPool(object):
+    """ A pool of keep-alive httplib connections grouped by
+    (scheme, host, port). At most pool_size idle connections are kept for
+    each host, extra connections are closed when released.
+    A Discogs instance has a single ConnectionPool, shared by all of its
+    resources.
+
+    >>> pool = ConnectionPool(pool_size=2)
+    >>> pool.pool_size
+    2
+    >>> pool._key('http://api.discogs.com/artists/45')
+    ('http', 'api.discogs.com', 80)
+    >>> pool._key('https://api.discogs.com:8443/artists/45')
+    ('https', 'api.discogs.com', 8443)
+    """
+
+    DEFAULT_POOL_SIZE = 10
+    DEFAULT_TIMEOUT = 30
+    DEFAULT_PORTS = {'http': httplib.HTTP_PORT, 'https': httplib.HTTPS_PORT}
+    CONNECTION_CLASSES = {'http': httplib.HTTPConnection,
+                          'https': httplib.HTTPSConnection}
+
+    def __init__(self, pool_size=None, timeout=None):
+        self.pool_size = pool_size or self.DEFAULT_POOL_SIZE
+        self.timeout = timeout or self.DEFAULT_TIMEOUT
+        self._pools = {}
+        self._lock = threading.Lock()
+        self.transfer = TransferStats()
+
+    def _key(self, url):
+        parsed = urlparse.urlsplit(url)
+        scheme = parsed.scheme
+        if scheme not in self.CONNECTION_CLASSES:
+            raise ConnectionPoolException('Unsupported scheme %s' % scheme)
+        port = parsed.port or self.DEFAULT_PORTS[scheme]
+        return scheme, parsed.hostname, port
+
+    def _queue(self, key):
+        with self._lock:
+            queue = self._pools.get(key)
+            if queue is None:
+                queue = self._pools[key] = Queue(self.pool_size)
+            return queue
+
+    def _new_connection(self, key):
+        scheme, host, port = key
+        connection_class = self.CONNECTION_CLASSES[scheme]
+        return connection_class(host, port, timeout=self.timeout)
+
+    def get_connection(self, key):
+        """ Returns a tuple (connection, reused), where reused tells whether
+        the connection came from the pool or was just created.
+        """
+        try:
+            return self._queue(key).get_nowait(), True
+        except Empty:
+            return self._new_connection(key), False
+
+    def put_connection(self, key, connection):
+        try:
+            self._queue(key).put_nowait(connection)
+        except Full:
+            connection.close()
+
+    def clear(self):
+        """ Closes all idle connections of the pool.
+        """
+        with self._lock:
+            queues = self._pools.values()
+            self._pools = {}
+        for queue in queues:
+            while True:
+                try:
+                    queue.get_nowait().close()
+                except Empty:
+                    break
+
+    def urlopen(self, method, url, headers=None):
+        """ Sends the request through a pooled connection and returns a
+        PooledResponse.
+        An idle connection may have been closed by the server in the
+        meantime, in this case the request is sent once again through a
+        new connection.
+        """
+        key = self._key(url)
+        parsed = urlparse.urlsplit(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path = "%s?%s" % (path, parsed.query)
+        headers = headers or {}
+        connection, reused = self.get_connection(key)
+        try:
+            connection.request(method, path, headers=headers)
+            response = connection.getresponse()
+        except (socket.error, httplib.HTTPException):
+            connection.close()
+            if not reused:
+                raise
+            connection = self._new_connection(key)
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+            except:
+                connection.close()
+                raise
+        return PooledResponse(self, key, connection, response, url)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,64 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Module for the JSON decoders used by DiscogsBase.
+    The decoder is chosen among the installed JSON libraries when a Discogs
+    instance decodes its first response, falling back to the next one of
+    DECODERS when the requested library isn't installed.
+"""
+
+DECODERS = ('orjson', 'simplejson', 'json')
+
+
+class DecoderException(Exception):
+    pass
+
+
+def _load(name):
+    """ Returns the loads function of the named library, or None if it is
+    not installed.
+    """
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+    return module.loads
+
+
+def get_decoder(name=None):
+    """ Returns a tuple (name, loads) with the decoder of the named library,
+    or the first one installed, in the DECODERS order, if it is missing or
+    no name is given.
+
+    >>> get_decoder('json')[0]
+    'json'
+    >>> get_decoder('nosuchjson')[0] in DECODERS
+    True
+    """
+    names = DECODERS
+    if name:
+        names = (name,) + tuple(i for i in DECODERS if i != name)
+    for name in names:
+        loads = _load(name)
+        if loads is not None:
+            return name, loads
+    raise DecoderException('None of the JSON libraries %s is installed' %
+                           ', '.join(names))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -17,13 +17,38 @@
 """ Main module of Discogs API Python Wrapper.
 """
 
+from importlib import import_module
+
 from discogsapi.base import DiscogsBase
-from discogsapi.resource.database.artist import ArtistsResource
-from discogsapi.resource.database.master import MastersResource
-from discogsapi.resource.database.label import LabelsResource
-from discogsapi.resource.database.release import ReleasesResource
-from discogsapi.resource.database.image import ImageResource
-from discogsapi.resource.database.search import SearchResource
+
+
+class LazyResource(object):
+    """ Descriptor of a resource of the Discogs class, given by the name of
+    its class and module. The module is imported, and the resource created,
+    only when the resource is first accessed, so a Discogs instance only
+    pays for the resources it uses.
+
+    >>> Discogs.artists.resource_class
+    <class 'discogsapi.resource.database.artist.ArtistsResource'>
+    """
+
+    def __init__(self, module, class_name):
+        self.module = module
+        self.class_name = class_name
+        self._resource_class = None
+
+    @property
+    def resource_class(self):
+        if self._resource_class is None:
+            module = import_module(self.module)
+            self._resource_class = getattr(module, self.class_name)
+        return self._resource_class
+
+    def __get__(self, discogs, owner):
+        if discogs is None:
+            return self
+        resource = discogs.get_resource(self.resource_class)
+        return discogs.public_resource(resource)
 
 
 class Discogs(DiscogsBase):
@@ -40,10 +65,18 @@ class Discogs(DiscogsBase):
       - labels:
             get(id): get a label details, a Label EntityResource
       - images:
-            get(filename): get an image, an addinfourl object response
+            get(filename): get an image, an Image with the file-like response
       - search:
             query(params): run a search query
 
+    A Discogs instance is thread-safe, and is meant to be shared by all the
+    threads of an application, e.g. the workers of a thread pool, so they
+    share its connection pool, cache and rate limiter. Its resources keep
+    no state between calls (Resource.data is local to each thread), the
+    entities are read-only once built, and the generators hand out each item
+    to a single thread. The only objects that can't be used by two threads
+    at the same time are the image responses being streamed.
+
     >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
     >>> discogs.artists.get(45)
     <Artist: Aphex Twin>
@@ -77,14 +110,25 @@ class Discogs(DiscogsBase):
     True
     """
 
-    def __init__(self, *args, **kwargs):
-        super(Discogs, self).__init__(*args, **kwargs)
-        self.artists = ArtistsResource(self)
-        self.releases = ReleasesResource(self)
-        self.masters = MastersResource(self)
-        self.labels = LabelsResource(self)
-        self.images = ImageResource(self)
-        self.search = SearchResource(self)
+    artists = LazyResource('discogsapi.resource.database.artist',
+                           'ArtistsResource')
+    releases = LazyResource('discogsapi.resource.database.release',
+                            'ReleasesResource')
+    masters = LazyResource('discogsapi.resource.database.master',
+                           'MastersResource')
+    labels = LazyResource('discogsapi.resource.database.label',
+                          'LabelsResource')
+    images = LazyResource('discogsapi.resource.database.image',
+                          'ImageResource')
+    search = LazyResource('discogsapi.resource.database.search',
+                          'SearchResource')
+
+    def public_resource(self, resource):
+        """ Returns the object exposing resource as an attribute of this
+        instance, the resource itself. Subclasses may wrap it, see
+        AsyncDiscogs.
+        """
+        return resource
 
 
 if __name__ == "__main__":
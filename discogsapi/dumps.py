@@ -0,0 +1,353 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+""" Module for reading the monthly XML data dumps of Discogs
+    (http://data.discogs.com), holding the whole catalogue of releases,
+    artists, labels and masters, for the work that would take far too many
+    API requests.
+    The dumps are parsed incrementally, one record at a time, so the memory
+    used doesn't grow with their size (tens of GB). Each record is converted
+    to the same dict the API returns for the entity, and wrapped into the
+    same entity classes: Release, Artist, Label and Master, or their compact
+    flavours for a compact Discogs instance. The images are given the
+    resource_url of the API, built from their uri; those without an uri
+    (all of them in the recent dumps) are left out.
+    An uncompressed dump can also be split into byte ranges, parsed by many
+    processes at the same time, see DumpReader.map.
+"""
+
+import gzip
+import os
+
+try:
+    from xml.etree import cElementTree as ElementTree
+except ImportError:
+    from xml.etree import ElementTree
+
+from discogsapi.discogs import Discogs
+
+
+class DumpException(Exception):
+    pass
+
+
+# The kinds of dump, by the tag of their root element, with the tag of
+# their records and the Discogs resource of the entities
+KINDS = {
+    'releases': ('release', 'releases'),
+    'artists': ('artist', 'artists'),
+    'labels': ('label', 'labels'),
+    'masters': ('master', 'masters'),
+}
+
+# Elements holding a list of elements, converted to a list
+LISTS = frozenset(('images', 'artists', 'extraartists', 'labels', 'formats',
+                   'genres', 'styles', 'tracklist', 'identifiers', 'videos',
+                   'companies', 'urls', 'namevariations', 'aliases',
+                   'members', 'groups', 'sublabels', 'descriptions',
+                   'sub_tracks'))
+
+# Elements and attributes named differently in the API
+RENAMES = {'parentLabel': 'parent_label', 'contactinfo': 'contact_info',
+           'src': 'uri'}
+
+# Elements and attributes with integer values
+INTEGERS = frozenset(('id', 'qty', 'width', 'height', 'main_release',
+                      'year', 'master_id', 'entity_type', 'duration'))
+
+
+def _attributes(attrib):
+    value = {}
+    for key, text in attrib.items():
+        if key in INTEGERS and text.isdigit():
+            text = int(text)
+        value[RENAMES.get(key, key)] = text
+    return value
+
+
+def _images(images):
+    """ Returns the images having an uri, with the resource_url the API has
+    for them. The images of the recent dumps have no uri: they can't be
+    downloaded, and are left out.
+
+    >>> _images([{'type': 'primary', 'uri': ''},
+    ...          {'type': 'secondary', 'uri': 'http://s.discogs.com/image/A-1-2.jpeg'}])
+    [{'resource_url': 'http://api.discogs.com/image/A-1-2.jpeg', 'type': 'secondary', 'uri': 'http://s.discogs.com/image/A-1-2.jpeg'}]
+    """
+    value = []
+    for image in images:
+        uri = image.get('uri') if isinstance(image, dict) else None
+        if not uri:
+            continue
+        image.setdefault('resource_url', '%s/image/%s' % (
+            Discogs.BASE_URL, uri.rstrip('/').split('/')[-1]))
+        value.append(image)
+    return value
+
+
+def convert(element):
+    """ Converts an element of a dump into the value the API has for it:
+    lists for the list elements, dicts for the elements with attributes or
+    children, and the text for the other ones. The text of an element with
+    attributes is its 'name', e.g. <label id="1">Planet E</label>.
+
+    >>> convert(ElementTree.fromstring(
+    ...     '<label><id>1</id><name>Planet E</name>'
+    ...     '<sublabels><label id="2">Seventh Sign</label></sublabels>'
+    ...     '<parentLabel id="3">Parent</parentLabel></label>'))
+    {'sublabels': [{'id': 2, 'name': 'Seventh Sign'}], 'parent_label': {'id': 3, 'name': 'Parent'}, 'id': 1, 'name': 'Planet E'}
+    """
+    children = list(element)
+    if not children:
+        text = element.text or ''
+        if element.tag in INTEGERS and text.strip().isdigit():
+            return int(text)
+        if element.attrib:
+            value = _attributes(element.attrib)
+            if text:
+                value['name'] = text
+            return value
+        return text
+    value = _attributes(element.attrib)
+    for child in children:
+        key = RENAMES.get(child.tag, child.tag)
+        if child.tag in LISTS:
+            items = list(child)
+            if child.tag == 'members':
+                # the member ids are repeated in the name elements
+                items = [i for i in items if i.tag == 'name']
+            value[key] = [convert(i) for i in items]
+            if child.tag == 'images':
+                value[key] = _images(value[key])
+        else:
+            value[key] = convert(child)
+    return value
+
+
+class _RangeFile(object):
+    """ A file-like object reading the bytes from start to end of a file,
+    between the prefix and the suffix strings.
+    """
+
+    def __init__(self, path, start, end, prefix='', suffix=''):
+        self._file = open(path, 'rb')
+        self._file.seek(start)
+        self._left = end - start
+        self._prefix = prefix
+        self._suffix = suffix
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._left + len(self._prefix) + len(self._suffix)
+        data = self._prefix[:size]
+        self._prefix = self._prefix[len(data):]
+        if len(data) < size and self._left:
+            chunk = self._file.read(min(size - len(data), self._left))
+            self._left -= len(chunk)
+            if not chunk:
+                self._left = 0
+            data += chunk
+        if len(data) < size and not self._left:
+            suffix = self._suffix[:size - len(data)]
+            self._suffix = self._suffix[len(suffix):]
+            data += suffix
+        return data
+
+    def close(self):
+        self._file.close()
+
+
+class DumpReader(object):
+    """ Reads a dump file, uncompressed or gzipped (.gz), and yields its
+    records as entities of the discogs instance: iterate over it. The kind
+    of the dump, 'releases', 'artists', 'labels' or 'masters', is found in
+    the file unless given.
+
+    >>> import tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'labels.xml')
+    >>> with open(path, 'w') as afile:
+    ...     afile.write('<labels><label><id>1</id><name>Planet E</name>'
+    ...                 '</label><label><id>2</id><name>Earthtones</name>'
+    ...                 '</label></labels>')
+    >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
+    >>> reader = DumpReader(discogs, path)
+    >>> reader.kind
+    'labels'
+    >>> list(reader)
+    [<Label: Planet E>, <Label: Earthtones>]
+    >>> reader.ranges(3)
+    [(8, 54), (54, 102)]
+    >>> list(reader.parse_range(54, 102))
+    [<Label: Earthtones>]
+    """
+
+    BLOCK_SIZE = 1024 * 1024
+
+    def __init__(self, discogs, path, kind=None):
+        self.discogs = discogs
+        self.path = path
+        self.compressed = path.endswith('.gz')
+        self.kind = kind or self._find_kind()
+        if self.kind not in KINDS:
+            raise DumpException("Unknown kind of dump %s" % self.kind)
+        self.tag, resource = KINDS[self.kind]
+        self.resource = getattr(discogs, resource)
+        # the records start with this marker, which the nested elements of
+        # the same tag don't match: they have attributes (e.g. the sublabels)
+        # while the records don't, or the other way round
+        if self.kind in ('releases', 'masters'):
+            self.marker = '<%s ' % self.tag
+        else:
+            self.marker = '<%s>' % self.tag
+
+    def _open(self):
+        if self.compressed:
+            return gzip.open(self.path, 'rb')
+        return open(self.path, 'rb')
+
+    def _find_kind(self):
+        afile = self._open()
+        try:
+            for event, element in ElementTree.iterparse(afile, ('start',)):
+                return element.tag
+        finally:
+            afile.close()
+
+    def __iter__(self):
+        afile = self._open()
+        try:
+            for entity in self._parse(afile):
+                yield entity
+        finally:
+            afile.close()
+
+    def _parse(self, afile):
+        """ Yields the entities of the records of afile, clearing each
+        record, and the references of the root element to it, once it is
+        converted, so the parsed tree never grows.
+        """
+        entity = self.resource.entity
+        depth = 0
+        root = None
+        for event, element in ElementTree.iterparse(afile,
+                                                    ('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = element
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1 and element.tag == self.tag:
+                data = convert(element)
+                if self.kind == 'releases':
+                    released = data.get('released') or ''
+                    if released[:4].isdigit():
+                        data.setdefault('year', int(released[:4]))
+                yield entity(data)
+                element.clear()
+                root.clear()
+
+    def _find(self, afile, offset):
+        """ Returns the offset of the first record marker at or after
+        offset, or None.
+        """
+        afile.seek(offset)
+        overlap = len(self.marker) - 1
+        tail = ''
+        while True:
+            block = afile.read(self.BLOCK_SIZE)
+            if not block:
+                return None
+            data = tail + block
+            index = data.find(self.marker)
+            if index >= 0:
+                return offset - len(tail) + index
+            tail = data[-overlap:]
+            offset += len(block)
+
+    def ranges(self, chunks):
+        """ Splits the records of the dump into up to chunks byte ranges,
+        (start, end) tuples, of about the same size. Only an uncompressed
+        dump can be split, since a gzipped one can't be read from an
+        arbitrary offset.
+        """
+        if self.compressed:
+            raise DumpException("A compressed dump can't be split, "
+                                "decompress it first")
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as afile:
+            first = self._find(afile, 0)
+            if first is None:
+                return []
+            afile.seek(max(size - self.BLOCK_SIZE, 0))
+            tail = afile.read()
+            end = tail.rfind('</%s>' % self.kind)
+            end = size - len(tail) + end if end >= 0 else size
+            bounds = [first]
+            for i in range(1, chunks):
+                bound = self._find(afile, max(size * i // chunks,
+                                              bounds[-1] + 1))
+                if bound is None or bound >= end:
+                    break
+                bounds.append(bound)
+        bounds.append(end)
+        return zip(bounds[:-1], bounds[1:])
+
+    def parse_range(self, start, end):
+        """ Yields the entities of the records in the byte range from start
+        to end, as given by ranges.
+        """
+        afile = _RangeFile(self.path, start, end, '<%s>' % self.kind,
+                           '</%s>' % self.kind)
+        try:
+            for entity in self._parse(afile):
+                yield entity
+        finally:
+            afile.close()
+
+    def map(self, func, processes=None, chunks=None):
+        """ Splits the dump into chunks byte ranges (by default 4 per
+        process) and calls func in a pool of processes (by default one per
+        core) for each range, with an iterator of its entities. It returns
+        the list of the values returned by func, in the order of the ranges.
+        func must be a module level function, so it can be pickled, and the
+        entities are bound to a new Discogs instance in each process, with
+        the same user_agent and compact flag.
+        """
+        # only mapping the dump needs the process pool
+        import multiprocessing
+        processes = processes or multiprocessing.cpu_count()
+        ranges = self.ranges(chunks or processes * 4)
+        args = [(self.discogs.user_agent, self.discogs.compact, self.path,
+                 self.kind, start, end, func) for start, end in ranges]
+        pool = multiprocessing.Pool(processes)
+        try:
+            return pool.map(_map_range, args, chunksize=1)
+        finally:
+            pool.terminate()
+
+
+def _map_range(args):
+    user_agent, compact, path, kind, start, end, func = args
+    discogs = Discogs(user_agent, compact=compact)
+    reader = DumpReader(discogs, path, kind)
+    return func(reader.parse_range(start, end))
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
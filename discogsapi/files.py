@@ -0,0 +1,63 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+""" Module for writing files atomically.
+"""
+
+import os
+import tempfile
+from contextlib import contextmanager
+
+# The umask is read once, at import: reading it means setting it, which
+# would race with the threads creating files.
+UMASK = os.umask(0)
+os.umask(UMASK)
+
+
+@contextmanager
+def atomic_file(path, mode='wb'):
+    """ Yields a temporary file, in the directory of path, renamed to path
+    when the block ends, or removed if it raises, so path is never left
+    half written. The file gets the permissions of the files created by
+    open, not the 0600 of mkstemp.
+
+    >>> import shutil
+    >>> directory = tempfile.mkdtemp()
+    >>> path = os.path.join(directory, 'data.txt')
+    >>> with atomic_file(path, 'w') as afile:
+    ...     afile.write('data')
+    >>> open(path).read(), os.listdir(directory)
+    ('data', ['data.txt'])
+    >>> os.stat(path).st_mode & 0777 == 0666 & ~UMASK
+    True
+    >>> shutil.rmtree(directory)
+    """
+    directory, filename = os.path.split(os.path.abspath(path))
+    fd, tmppath = tempfile.mkstemp(prefix='.%s.' % filename, dir=directory)
+    try:
+        with os.fdopen(fd, mode) as afile:
+            yield afile
+        os.chmod(tmppath, 0666 & ~UMASK)
+        os.rename(tmppath, path)
+    except:
+        os.remove(tmppath)
+        raise
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,282 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+""" Module for the instrumentation of DiscogsBase.
+    Every request made through a Discogs instance, served by the API or by
+    the cache, fires a RequestEvent to the hooks of the instance (see
+    DiscogsBase.add_hook). MetricsAggregator is a hook keeping counters and
+    latency histograms per resource name, which can be read as a dict or
+    dumped as text in the Prometheus exposition format, to be scraped.
+"""
+
+import threading
+import time
+
+
+class RequestEvent(object):
+    """ The details of a request, passed to the hooks once it is done:
+        resource: the resource name, the first segment of the path
+        path, params: the request, url: the last url requested
+        status: the HTTP status, None if the request failed before a
+                response or was served by the cache
+        latency: seconds from the start to the end of the request
+        wire_bytes, decoded_bytes: body bytes, before and after the
+                                   decompression
+        cache: 'hit', 'miss', 'revalidated' or None without cache
+        coalesced: True if the request shared the result of an identical
+                   request in flight
+        retries: number of times the request was sent again
+        rate_limit_wait: seconds spent waiting for the rate limiter
+        error: the exception raised, if any
+
+    >>> event = RequestEvent('/artists/45/releases', {'page': 2})
+    >>> event.resource
+    'artists'
+    """
+
+    def __init__(self, path, params=None):
+        self.path = path
+        self.params = params
+        self.resource = path.split('/', 2)[1] if path.startswith('/') \
+                        else ''
+        self.url = None
+        self.status = None
+        self.started = time.time()
+        self.latency = 0.0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.cache = None
+        self.coalesced = False
+        self.retries = 0
+        self.rate_limit_wait = 0.0
+        self.error = None
+
+    def finish(self):
+        self.latency = time.time() - self.started
+
+    def __unicode__(self):
+        return u'%s %s %.3fs' % (self.path, self.status or self.cache,
+                                 self.latency)
+
+    def __str__(self):
+        return self.__unicode__().encode('utf-8')
+
+    def __repr__(self):
+        return "<RequestEvent: %s>" % self.__str__()
+
+
+class Histogram(object):
+    """ A latency histogram with cumulative buckets, the upper bounds in
+    seconds.
+
+    >>> histogram = Histogram((0.1, 1))
+    >>> for latency in (0.05, 0.2, 0.3, 5):
+    ...     histogram.observe(latency)
+    >>> histogram.counts
+    [1, 3, 4]
+    >>> histogram.percentile(50)
+    1
+    """
+
+    BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.counts[-1] += 1
+
+    def percentile(self, percent):
+        """ Returns the upper bound of the bucket holding the percentile,
+        or None if it is above the last bucket.
+        """
+        rank = self.count * percent / 100.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count >= rank:
+                return bound
+        return None
+
+
+class ResourceMetrics(object):
+    """ The counters of the requests of a resource.
+    """
+
+    def __init__(self, buckets=None):
+        self.requests = 0
+        self.errors = 0
+        self.statuses = {}
+        self.cache = {}
+        self.coalesced = 0
+        self.retries = 0
+        self.rate_limit_wait = 0.0
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self.latency = Histogram(buckets)
+
+    def add(self, event):
+        self.requests += 1
+        if event.error is not None:
+            self.errors += 1
+        if event.status is not None:
+            self.statuses[event.status] = \
+                self.statuses.get(event.status, 0) + 1
+        if event.cache is not None:
+            self.cache[event.cache] = self.cache.get(event.cache, 0) + 1
+        if event.coalesced:
+            self.coalesced += 1
+        self.retries += event.retries
+        self.rate_limit_wait += event.rate_limit_wait
+        self.wire_bytes += event.wire_bytes
+        self.decoded_bytes += event.decoded_bytes
+        self.latency.observe(event.latency)
+
+    def stats(self):
+        return dict(requests=self.requests, errors=self.errors,
+                    statuses=dict(self.statuses), cache=dict(self.cache),
+                    coalesced=self.coalesced,
+                    retries=self.retries,
+                    rate_limit_wait=self.rate_limit_wait,
+                    wire_bytes=self.wire_bytes,
+                    decoded_bytes=self.decoded_bytes,
+                    latency_sum=self.latency.sum,
+                    latency_p50=self.latency.percentile(50),
+                    latency_p99=self.latency.percentile(99))
+
+
+class MetricsAggregator(object):
+    """ A hook aggregating the RequestEvents per resource name. buckets are
+    the upper bounds of the latency histograms, in seconds.
+
+    >>> from discogsapi import Discogs
+    >>> from discogsapi.transport import MemoryTransport
+    >>> transport = MemoryTransport({'/artists/45': {'name': 'Aphex Twin'}})
+    >>> metrics = MetricsAggregator()
+    >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+    ...                   transport=transport, hooks=[metrics])
+    >>> discogs.artists.get(45)
+    <Artist: Aphex Twin>
+    >>> stats = metrics.stats()['artists']
+    >>> stats['requests'], stats['statuses'], stats['decoded_bytes']
+    (1, {200: 1}, 22)
+    >>> print metrics.dump()   # doctest: +ELLIPSIS
+    # TYPE discogs_requests_total counter
+    discogs_requests_total{resource="artists"} 1
+    ...
+    discogs_request_seconds_bucket{resource="artists",le="+Inf"} 1
+    ...
+    """
+
+    PREFIX = 'discogs'
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets
+        self.resources = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            metrics = self.resources.get(event.resource)
+            if metrics is None:
+                metrics = self.resources[event.resource] = \
+                    ResourceMetrics(self.buckets)
+            metrics.add(event)
+
+    def reset(self):
+        with self._lock:
+            self.resources = {}
+
+    def stats(self):
+        """ Returns a dict of {resource name: dict of counters}.
+        """
+        with self._lock:
+            return dict((name, metrics.stats())
+                        for name, metrics in self.resources.items())
+
+    def _samples(self):
+        """ Yields (name, type, [(labels, value)]) of each metric.
+        """
+        resources = sorted(self.resources.items())
+
+        def counter(name, attr):
+            return ('%s_%s' % (self.PREFIX, name), 'counter',
+                    [({'resource': r}, getattr(m, attr))
+                     for r, m in resources])
+
+        yield counter('requests_total', 'requests')
+        yield counter('errors_total', 'errors')
+        yield ('%s_responses_total' % self.PREFIX, 'counter',
+               [({'resource': r, 'status': s}, c) for r, m in resources
+                for s, c in sorted(m.statuses.items())])
+        yield ('%s_cache_total' % self.PREFIX, 'counter',
+               [({'resource': r, 'result': s}, c) for r, m in resources
+                for s, c in sorted(m.cache.items())])
+        yield counter('coalesced_total', 'coalesced')
+        yield counter('retries_total', 'retries')
+        yield counter('rate_limit_wait_seconds_total', 'rate_limit_wait')
+        yield counter('wire_bytes_total', 'wire_bytes')
+        yield counter('decoded_bytes_total', 'decoded_bytes')
+        samples = []
+        for resource, metrics in resources:
+            histogram = metrics.latency
+            bounds = [str(i) for i in histogram.buckets] + ['+Inf']
+            for bound, count in zip(bounds, histogram.counts):
+                samples.append(({'resource': resource, 'le': bound}, count,
+                                '_bucket'))
+            samples.append(({'resource': resource}, histogram.sum, '_sum'))
+            samples.append(({'resource': resource}, histogram.count,
+                            '_count'))
+        yield '%s_request_seconds' % self.PREFIX, 'histogram', samples
+
+    def dump(self):
+        """ Returns the metrics as text, in the Prometheus exposition
+        format.
+        """
+        lines = []
+        with self._lock:
+            for name, type, samples in self._samples():
+                lines.append('# TYPE %s %s' % (name, type))
+                for sample in samples:
+                    labels, value = sample[:2]
+                    suffix = sample[2] if len(sample) > 2 else ''
+                    labels = ','.join('%s="%s"' % (k, labels[k]) for k in
+                                      sorted(labels, key=self._label_order))
+                    lines.append('%s%s{%s} %s' % (name, suffix, labels,
+                                                  self._format(value)))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _label_order(name):
+        return (name != 'resource', name)
+
+    @staticmethod
+    def _format(value):
+        if isinstance(value, float):
+            return repr(value)
+        return str(value)
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
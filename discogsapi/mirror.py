@@ -0,0 +1,159 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Module for mirroring the images of Discogs entities into a directory.
+"""
+
+import os
+
+from discogsapi.ratelimit import RateLimitExceeded
+from discogsapi.resource.base import BulkResult
+from discogsapi.resource.entity import EntityResource, ImageEntityResource
+from discogsapi.resource.compact import CompactEntity, CompactImage
+from discogsapi.resource.database.image import Image, ImageResource
+
+
+class ImageMirror(object):
+    """ Downloads the images referenced by entities into the directory path,
+    with up to concurrency downloads at the same time.
+
+    >>> from discogsapi import Discogs
+    >>> import tempfile
+    >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
+    >>> mirror = ImageMirror(discogs, tempfile.mkdtemp())
+    >>> stats = mirror.mirror([discogs.releases.get(45)])
+    >>> stats['downloaded'], stats['failed']
+    (1, 0)
+    >>> mirror.mirror([discogs.releases.get(45)])['skipped']
+    1
+
+    The items given to mirror can be Images, entities (their thumb and
+    images attributes are used, e.g. Artist and Release) or iterables of
+    them, like the EntityResourceGenerators returned by get_releases.
+    Each filename is downloaded once. Every completed download is appended
+    to a manifest file (in path by default) with its size, so after a
+    crash a new mirror skips the files already on disk with the same size.
+    The downloads go through the Discogs instance, so they are rate limited
+    as any other request. When the image download quota is exceeded
+    (RateLimitExceeded), the mirroring stops and the exception is raised.
+    """
+
+    MANIFEST = '.discogs_mirror_manifest'
+
+    def __init__(self, discogs, path, concurrency=4, manifest=None):
+        self.discogs = discogs
+        self.path = path
+        self.concurrency = concurrency
+        self.manifest = manifest or os.path.join(path, self.MANIFEST)
+        self.sizes = self._read_manifest()
+        self.errors = {}
+        self.image_resource = discogs.get_resource(ImageResource)
+
+    def _read_manifest(self):
+        """ Returns a dict with the size of each file in the manifest. A
+        partially written last line (after a crash) is ignored.
+        """
+        sizes = {}
+        if not os.path.isfile(self.manifest):
+            return sizes
+        with open(self.manifest) as afile:
+            for line in afile:
+                filename, sep, size = line.rstrip('\n').rpartition('\t')
+                if sep and size.isdigit():
+                    sizes[filename] = int(size)
+        return sizes
+
+    def _open_manifest(self):
+        """ Opens the manifest for appending, after ending a partially
+        written last line, so the new lines are read back.
+        """
+        manifest = open(self.manifest, 'a+')
+        manifest.seek(0, os.SEEK_END)
+        if manifest.tell():
+            manifest.seek(-1, os.SEEK_END)
+            if manifest.read(1) != '\n':
+                manifest.write('\n')
+        return manifest
+
+    def _is_mirrored(self, filename):
+        size = self.sizes.get(filename)
+        filepath = os.path.join(self.path, filename)
+        return size is not None and os.path.isfile(filepath) and \
+               os.path.getsize(filepath) == size
+
+    def images(self, items):
+        """ Yields the Images referenced by items.
+        """
+        for item in items:
+            if isinstance(item, ImageEntityResource):
+                yield item
+            elif isinstance(item, CompactImage):
+                yield item.image
+            elif isinstance(item, dict) and item.get('resource_url'):
+                yield Image(self.image_resource, data=item)
+            elif isinstance(item, (EntityResource, CompactEntity)):
+                for attr in ('thumb', 'images'):
+                    value = getattr(item, attr, None)
+                    if not value:
+                        continue
+                    if not isinstance(value, (list, tuple)):
+                        value = [value]
+                    for image in self.images(value):
+                        yield image
+            elif hasattr(item, '__iter__'):
+                for image in self.images(item):
+                    yield image
+
+    def _download(self, image):
+        filepath = image.save(self.path)
+        return image.filename, os.path.getsize(filepath)
+
+    def _new_images(self, items, stats):
+        seen = set()
+        for image in self.images(items):
+            filename = image.filename
+            if not filename or filename in seen:
+                continue
+            seen.add(filename)
+            if self._is_mirrored(filename):
+                stats['skipped'] += 1
+                continue
+            yield image
+
+    def mirror(self, items):
+        """ Downloads the images referenced by items and returns a dict with
+        the number of images downloaded, skipped and failed, and the bytes
+        downloaded. The errors of the failed images are kept in the errors
+        dict, by filename.
+        """
+        stats = dict(downloaded=0, skipped=0, failed=0, bytes=0)
+        downloads = BulkResult(self._download, self._new_images(items, stats),
+                               self.concurrency, fatal=RateLimitExceeded)
+        with self._open_manifest() as manifest:
+            for filename, size in downloads:
+                manifest.write('%s\t%s\n' % (filename, size))
+                manifest.flush()
+                self.sizes[filename] = size
+                stats['downloaded'] += 1
+                stats['bytes'] += size
+        for image, error in downloads.errors.items():
+            self.errors[image.filename] = error
+            stats['failed'] += 1
+        return stats
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
@@ -0,0 +1,81 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Module for the background page prefetching of paginated resources.
+"""
+
+import sys
+import threading
+from Queue import Queue, Full
+
+
+class PagePrefetcher(object):
+    """ Follows the 'next' urls of a paginated resource in a background
+    thread, keeping up to depth pages ready to be consumed.
+    The thread doesn't hold any reference to the EntityResourceGenerator
+    consuming the pages, so an abandoned generator can still be collected,
+    which stops the prefetcher.
+    """
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, discogs, url, depth):
+        self.depth = depth
+        self.queue = Queue(depth)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(discogs, url))
+        self.thread.daemon = True
+        self.thread.start()
+
+    def _run(self, discogs, url):
+        while url and not self.stopped.is_set():
+            try:
+                data = discogs.get_data_from_full_url(url)
+            except Exception:
+                self._put((None, sys.exc_info()))
+                return
+            pagination = data.get('pagination') or {}
+            url = (pagination.get('urls') or {}).get('next')
+            if not self._put((data, None)):
+                return
+        self._put((None, None))
+
+    def _put(self, item):
+        """ Puts the item in the queue, giving up if the prefetcher is
+        stopped while waiting for a free slot.
+        """
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=self.POLL_INTERVAL)
+                return True
+            except Full:
+                pass
+        return False
+
+    def get(self):
+        """ Returns the data of the next page, or None if there are no more
+        pages. An error raised while fetching the page is raised here.
+        """
+        data, exc_info = self.queue.get()
+        if exc_info:
+            self.stop()
+            raise exc_info[0], exc_info[1], exc_info[2]
+        if data is None:
+            self.stop()
+        return data
+
+    def stop(self):
+        self.stopped.set()
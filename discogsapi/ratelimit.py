@@ -14,13 +14,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
-import re
 import datetime
-import externalip
+import mmap
 import os
+import struct
 import tempfile
+import threading
+import time
 
-IP_REGEXP_STR = r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}"
+try:
+    import fcntl
+except ImportError:
+    # not available on Windows, see _FileLock
+    fcntl = None
 
 
 class RateLimitException(Exception):
@@ -31,6 +37,251 @@ class RateLimitExceeded(Exception):
     pass
 
 
+class TokenBucket(object):
+    """ A thread-safe token bucket rate limiter, allowing rate requests per
+    period seconds, with bursts of up to capacity requests (rate by default).
+    Attached to a Discogs instance (the rate_limiter argument), each request
+    sent to the API acquires a token first.
+    When there are no tokens left, acquire waits for the next one if block
+    is True, unless the wait would be longer than timeout seconds, otherwise
+    it raises RateLimitExceeded right away. The waiting callers reserve
+    their tokens in order, so they are served fairly.
+
+    >>> bucket = TokenBucket(2, period=1, block=False)
+    >>> bucket.acquire(), bucket.acquire()
+    (0.0, 0.0)
+    >>> bucket.acquire()
+    Traceback (most recent call last):
+    ...
+    RateLimitExceeded: No tokens available, next one in 0.50 seconds
+    >>> bucket = TokenBucket(10, period=1, capacity=1)
+    >>> bucket.acquire()
+    0.0
+    >>> 0 < bucket.acquire() <= 0.1
+    True
+    """
+
+    def __init__(self, rate, period=60.0, capacity=None, block=True,
+                 timeout=None):
+        self.rate = rate
+        self.period = period
+        self.capacity = capacity or rate
+        self.block = block
+        self.timeout = timeout
+        self.waited = 0.0
+        self._per_second = float(rate) / period
+        self._tokens = float(self.capacity)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """ Takes the tokens and returns how many seconds the caller must
+        wait before using them. If the caller can't wait, the tokens are not
+        taken and RateLimitExceeded is raised.
+        """
+        with self._lock:
+            now = time.time()
+            elapsed = max(now - self._updated, 0)
+            self._updated = now
+            self._tokens = min(self.capacity,
+                               self._tokens + elapsed * self._per_second)
+            wait = max(tokens - self._tokens, 0) / self._per_second
+            if wait and (not self.block or
+                         (self.timeout is not None and wait > self.timeout)):
+                raise RateLimitExceeded('No tokens available, next one in '
+                                        '%.2f seconds' % wait)
+            self._tokens -= tokens
+            return wait
+
+    def penalize(self, seconds):
+        """ Empties the bucket so the next token comes only after seconds,
+        e.g. when the API answered 429 Too Many Requests.
+
+        >>> bucket = TokenBucket(10, period=1, block=False)
+        >>> bucket.penalize(2)
+        >>> bucket.acquire()
+        Traceback (most recent call last):
+        ...
+        RateLimitExceeded: No tokens available, next one in 2.10 seconds
+        """
+        with self._lock:
+            now = time.time()
+            elapsed = max(now - self._updated, 0)
+            self._updated = now
+            tokens = min(self.capacity,
+                         self._tokens + elapsed * self._per_second)
+            self._tokens = min(tokens, 0) - seconds * self._per_second
+
+    def acquire(self, tokens=1):
+        """ Takes tokens from the bucket, waiting for them if needed, and
+        returns the number of seconds waited.
+        """
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+            self.waited += wait
+        return wait
+
+
+class SharedRateLimiter(object):
+    """ A rate limiter shared by all the processes of a host. It allows
+    limit requests per period seconds, counted in fixed windows. The window
+    start and the count live in a small memory-mapped file, updated under an
+    fcntl lock, so each check is an atomic O(1) operation. Where fcntl is
+    missing (Windows), it is only shared by the threads of a process.
+    Like the TokenBucket, it can be attached to a Discogs instance (the
+    rate_limiter argument): when the limit is reached, acquire waits for the
+    next window if block is True, otherwise it raises RateLimitExceeded.
+    close releases the file, it can also be used as a context manager.
+
+    >>> path = os.path.join(tempfile.mkdtemp(), 'discogs.limit')
+    >>> limiter = SharedRateLimiter(path, limit=2, period=60, block=False)
+    >>> limiter.acquire(), limiter.acquire()
+    (0, 0)
+    >>> with SharedRateLimiter(path, limit=2, period=60) as other:
+    ...     other.count
+    2
+    >>> limiter.acquire()
+    Traceback (most recent call last):
+    ...
+    RateLimitExceeded: Rate limit exceeded 2 requests during 0 hours. You can wait 1 minutes to manage to request again.
+    >>> limiter.close()
+    """
+
+    MAGIC = 'DISCOGS1'
+    FORMAT = struct.Struct('8sdQ')
+
+    def __init__(self, path, limit, period, block=True):
+        self.path = path
+        self.limit = limit
+        self.period = period
+        self.block = block
+        self.waited = 0.0
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0644)
+        with self._locked():
+            if os.fstat(self._fd).st_size < self.FORMAT.size:
+                os.ftruncate(self._fd, self.FORMAT.size)
+            self._map = mmap.mmap(self._fd, self.FORMAT.size)
+            if self.FORMAT.unpack_from(self._map)[0] != self.MAGIC:
+                self._write(time.time(), 0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """ Unmaps and closes the file. The limiter can't be used after.
+        """
+        with self._lock:
+            if self._fd is None:
+                return
+            self._map.close()
+            os.close(self._fd)
+            self._fd = None
+
+    def _locked(self):
+        return _FileLock(self._lock, self._fd)
+
+    def _read(self):
+        magic, start, count = self.FORMAT.unpack_from(self._map)
+        return start, count
+
+    def _write(self, start, count):
+        self.FORMAT.pack_into(self._map, 0, self.MAGIC, start, count)
+
+    @property
+    def start(self):
+        return self._read()[0]
+
+    @property
+    def count(self):
+        return self._read()[1]
+
+    def reset(self):
+        """ Starts a new window, with no requests counted.
+        """
+        with self._locked():
+            self._write(time.time(), 0)
+
+    def penalize(self, seconds):
+        """ Closes the current window for seconds (at most a period), e.g.
+        when the API answered 429 Too Many Requests.
+        """
+        seconds = min(seconds, self.period)
+        with self._locked():
+            now = time.time()
+            start, count = self._read()
+            if 0 <= now - start < self.period and count >= self.limit and \
+               start + self.period >= now + seconds:
+                return
+            self._write(now + seconds - self.period, self.limit)
+
+    def increment(self):
+        """ Counts a request in the current window, or raises
+        RateLimitExceeded if the limit was reached. In this case the
+        exception has the seconds until the next window in its wait
+        attribute.
+        """
+        with self._locked():
+            now = time.time()
+            start, count = self._read()
+            if not 0 <= now - start < self.period:
+                start, count = now, 0
+            if count >= self.limit:
+                passed = now - start
+                err = RateLimitExceeded(
+                    'Rate limit exceeded %s requests during %d hours. You '
+                    'can wait %d minutes to manage to request again.' %
+                    (self.limit, passed / 3600,
+                     (self.period - passed + 59) / 60))
+                err.wait = self.period - passed
+                raise err
+            self._write(start, count + 1)
+
+    def acquire(self, tokens=1):
+        """ Counts the requests, waiting for the next window if needed (and
+        block is True), and returns the number of seconds waited.
+        """
+        waited = 0
+        for i in range(tokens):
+            while True:
+                try:
+                    self.increment()
+                    break
+                except RateLimitExceeded, err:
+                    if not self.block:
+                        raise
+                    time.sleep(err.wait)
+                    waited += err.wait
+        self.waited += waited
+        return waited
+
+
+class _FileLock(object):
+    """ Context manager holding a thread lock and an exclusive fcntl lock on
+    a file descriptor. The fcntl lock alone doesn't exclude the threads of
+    the same process. Without fcntl (on Windows) only the thread lock is
+    held, so the file is shared by the threads of a single process.
+    """
+
+    def __init__(self, lock, fd):
+        self.lock = lock
+        self.fd = fd
+
+    def __enter__(self):
+        self.lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+
+    def __exit__(self, *exc_info):
+        if fcntl is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        self.lock.release()
+
+
 class RateLimit:
     """
     >>> import time
@@ -59,79 +310,43 @@ class RateLimit:
 
     RATE_LIMIT = 1000 # this is default for Discogs API 2.0
     RATE_LIMIT_PERIOD_HOURS = 24 # this is default for Discogs API 2.0
-    RATE_LIMIT_LOCK_FILE = 'discogs_rate_limit.lock'
-    FORMAT_RATE_LIMIT_LOCK = '%(ip)s_%(datetime)s_%(count)s'
-    REGEXP_RATE_LIMIT_LOCK = re.compile(r'^(%s)_(.+)_(\d+)$' % IP_REGEXP_STR)
-    DATETIME_FORMAT = "%Y-%m-%dT%H:%M"
-
-    @classmethod
-    def _get_temp_file(cls, mode='r'):
-        tmp = tempfile.gettempprefix()
-        path = os.path.join('/', tmp, cls.RATE_LIMIT_LOCK_FILE)
-        if mode == 'r' and not os.path.isfile(path):
-            cls.init_rate_limit_lock()
-        return open(path, mode)
-
-    @classmethod
-    def _read(cls):
-        afile = cls._get_temp_file()
-        content = afile.read()
-        afile.close()
-        return content
+    RATE_LIMIT_LOCK_FILE = 'discogs_rate_limit.counter'
+    _limiters = {}
+    _limiters_lock = threading.Lock()
 
     @classmethod
-    def _write(cls, data):
-        afile = cls._get_temp_file('w')
-        afile.write(data)
-        afile.close()
+    def _limiter(cls):
+        """ Returns the SharedRateLimiter of the lock file, configured with
+        the current RATE_LIMIT and RATE_LIMIT_PERIOD_HOURS.
+        """
+        path = os.path.join(tempfile.gettempdir(), cls.RATE_LIMIT_LOCK_FILE)
+        with cls._limiters_lock:
+            limiter = cls._limiters.get(path)
+            if limiter is None:
+                limiter = SharedRateLimiter(path, 0, 0, block=False)
+                cls._limiters[path] = limiter
+        limiter.limit = cls.RATE_LIMIT
+        limiter.period = cls.RATE_LIMIT_PERIOD_HOURS * 3600
+        return limiter
 
     @classmethod
     def init_rate_limit_lock(cls):
-        ip = externalip.get_external_ip()
-        now = datetime.datetime.now()
-        cls._write(cls._data_format(ip, now, 0))
+        cls._limiter().reset()
 
     @classmethod
     def get_current_rate_limit_data(cls):
-        content = cls._read()
-        match = cls.REGEXP_RATE_LIMIT_LOCK.match(content)
-        if not match:
-            raise RateLimitException('Invalid rate limit data: %s' % content)
-        ip, date_str, count_str = match.groups()
-        date = datetime.datetime.strptime(date_str, cls.DATETIME_FORMAT)
-        count = int(count_str)
-        return ip, date, count
-
-    @classmethod
-    def _data_format(cls, ip, date, count, ip_updated=None):
-        data = dict(
-            ip=ip,
-            datetime=date.strftime(cls.DATETIME_FORMAT),
-            ip_updated=ip_updated or date,
-            count=count
-        )
-        return cls.FORMAT_RATE_LIMIT_LOCK % data
+        """ Returns a tuple (ip, date, count): the start of the current
+        period and the number of downloads counted since then. The count is
+        no longer kept by external IP, ip is always None and only kept for
+        the callers unpacking the tuple.
+        """
+        limiter = cls._limiter()
+        date = datetime.datetime.fromtimestamp(limiter.start)
+        return None, date, limiter.count
 
     @classmethod
     def test_limit_and_increment(cls):
-        now = datetime.datetime.now()
-        hours = cls.RATE_LIMIT_PERIOD_HOURS
-        oneday = datetime.timedelta(hours=hours)
-        ip, date, count = cls.get_current_rate_limit_data()
-        passed = now - date
-        if passed < oneday:
-            if count >= cls.RATE_LIMIT:
-                passed_hours = passed.seconds / 3600
-                remaining = hours - passed_hours
-                msg = 'Rate limit exceeded %s downloads during %s hours. '\
-                      'You can wait %s hours to manage to download again.' % \
-                        (cls.RATE_LIMIT, passed_hours, remaining)
-                raise RateLimitExceeded(msg)
-        else:
-            # restart the counting, since passed 24 hours
-            cls.init_rate_limit_lock()
-        count += 1
-        cls._write(cls._data_format(ip, date, count))
+        cls._limiter().increment()
 
 
 if __name__ == "__main__":
@@ -17,46 +17,169 @@
 """ Base module for all resources coming from Discogs API
 """
 
-import posixpath
+import threading
+from collections import deque
+from Queue import Queue
 
-from discogsapi.category.base import Category, CategoryException
+from discogsapi.category.base import CategoryException, CategoryMetaclass
+from discogsapi.ratelimit import RateLimitExceeded
 
 
 class ResourceException(Exception):
     pass
 
 
+class BulkResult(object):
+    """ Iterable returned by Resource.get_many. Iterating over it calls
+    get(id) for each id in a pool of worker threads and yields the results
+    as they complete, or in the same order of the ids if ordered is True.
+    At most twice the concurrency ids are in flight at any time, so long
+    (or endless) iterables of ids can be used.
+    A failed id doesn't abort the batch: its exception is stored in the
+    errors dict, by id, and the iteration goes on, unless it is an instance
+    of the fatal exception classes, which is raised.
+    """
+
+    def __init__(self, get, ids, concurrency, ordered=False, fatal=()):
+        self.get = get
+        self.ids = ids
+        self.concurrency = concurrency
+        self.ordered = ordered
+        self.fatal = fatal
+        self.errors = {}
+
+    def __iter__(self):
+        # imported here, multiprocessing is slow to import and seldom used
+        from multiprocessing.pool import ThreadPool
+        pool = ThreadPool(self.concurrency)
+        try:
+            for id, result, error in self._results(pool):
+                if isinstance(error, self.fatal):
+                    raise error
+                if error is not None:
+                    self.errors[id] = error
+                else:
+                    yield result
+        finally:
+            pool.terminate()
+
+    def _get(self, id):
+        try:
+            return id, self.get(id), None
+        except Exception, err:
+            return id, None, err
+
+    def _results(self, pool):
+        window = self.concurrency * 2
+        if self.ordered:
+            pending = deque()
+            for id in self.ids:
+                pending.append(pool.apply_async(self._get, (id,)))
+                if len(pending) >= window:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+        else:
+            done = Queue()
+            pending = 0
+            for id in self.ids:
+                pool.apply_async(self._get, (id,), callback=done.put)
+                pending += 1
+                if pending >= window:
+                    yield done.get()
+                    pending -= 1
+            while pending:
+                yield done.get()
+                pending -= 1
+
+
+def _dispatch_attrs(name, category):
+    """ Returns the attributes a resource needs to build the path of its
+    requests, computed once from its name and category.
+    """
+    return dict(_path_prefix="/%s" % name,
+                _path_template="/%s/%%s" % name,
+                _category_valid=category in CategoryMetaclass.registry)
+
+
+class ResourceMetaclass(type):
+    """ Precomputes the path prefix and the category check of each
+    resource class when it is defined, so they cost nothing per request.
+    """
+
+    def __new__(cls, name, bases, dct):
+        new_class = super(ResourceMetaclass, cls).__new__(cls, name, bases,
+                                                          dct)
+        for attr, value in _dispatch_attrs(new_class.name,
+                                           new_class.category).items():
+            setattr(new_class, attr, value)
+        return new_class
+
+
 class Resource(object):
     """ This is the base class of a Discogs Resource. It requires a Discogs
     instance to create new objects. It has methods to retrieve data information
     from Discogs API.
     Each resource has a 'name' attribute, which means the first item in the
     url path, e.g. Artist.name = 'artists' -> /artists/.
+    A resource is shared by all the threads using its Discogs instance, so
+    it keeps no state of its own between calls: the data attribute, set by
+    get_data, is local to each thread.
     """
+    __metaclass__ = ResourceMetaclass
     name = ''
     category = ''
+    entity_class = None
+    compact_entity_class = None
 
     def __init__(self, discogs):
         self.discogs = discogs
-        self.data = {}
+        self._local = threading.local()
+
+    def __setattr__(self, attr, value):
+        super(Resource, self).__setattr__(attr, value)
+        if attr in ('name', 'category'):
+            attrs = _dispatch_attrs(self.name, self.category)
+            for dispatch_attr, dispatch_value in attrs.items():
+                super(Resource, self).__setattr__(dispatch_attr,
+                                                  dispatch_value)
+
+    @property
+    def data(self):
+        """ The data of the last get_data call of the current thread.
+        """
+        return getattr(self._local, 'data', {})
+
+    @data.setter
+    def data(self, data):
+        self._local.data = data
 
     def _get_response_from_resource(self, subpath_tuple, params=None):
         """ The subpath_tuple can be anything after the resource.name.
         e.g. resource=Artist,
              subpath = ('12', 'releases') -> /artists/12/releases
-        It retrieves an addinfourl object response.
+        It retrieves a file-like object response, with the interface of the
+        urllib2 responses (see DiscogsBase.get_response).
         """
-        path = self.__path_from_subpath_tuple(subpath_tuple)
+        path = self._path(subpath_tuple)
         return self.discogs.get_response(path, params)
 
-    def __path_from_subpath_tuple(self, subpath_tuple):
-        subpath = ''
-        if subpath_tuple:
-            if not hasattr(subpath_tuple, '__iter__'):
-                subpath_tuple = (subpath_tuple,)
-            subpath = posixpath.join(*subpath_tuple)
-        subpath = "/%s" % subpath if subpath else ''
-        return "/%s%s" % (self.name, subpath)
+    def _path(self, subpath_tuple):
+        """ Returns the path of the request, the path prefix of the
+        resource followed by the subpath items, e.g. ids, separated by /.
+
+        >>> resource = Resource(None)
+        >>> resource.name = 'artists'
+        >>> resource._path(None), resource._path(45)
+        ('/artists', '/artists/45')
+        >>> resource._path((45, 'releases'))
+        '/artists/45/releases'
+        """
+        if not subpath_tuple and subpath_tuple != 0:
+            return self._path_prefix
+        if isinstance(subpath_tuple, (tuple, list)):
+            subpath_tuple = '/'.join(['%s' % i for i in subpath_tuple])
+        return self._path_template % subpath_tuple
 
     def _get_data_from_resource(self, subpath_tuple=None, params=None):
         """ The subpath can be anything after the resource.name.
@@ -64,11 +187,10 @@ class Resource(object):
         It returns a dict data, previously parsed from a JSON through the
         Discogs API call.
         """
-        category = self.category
-        if category not in Category.categories():
-            raise CategoryException("There's no category %s" % category)
-        path = self.__path_from_subpath_tuple(subpath_tuple)
-        return self.discogs.get_data(path, params)
+        if not self._category_valid:
+            raise CategoryException("There's no category %s" %
+                                    self.category)
+        return self.discogs.get_data(self._path(subpath_tuple), params)
 
     def get_data(self, subpath_tuple=None, params=None):
         """ The subpath_tuple can be anything after the resource.name.
@@ -97,7 +219,7 @@ class Resource(object):
     def get_response(self, subpath_tuple=None, params=None):
         """ The subpath can be anything after the resource.name.
         e.g. resource=Artist, subpath = 12/releases -> /arttists/12/releases
-        It retrieves an addinfourl object response.
+        It retrieves a file-like object response.
 
         >>> from discogs import Discogs
         >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
@@ -113,6 +235,40 @@ class Resource(object):
         """
         return self._get_response_from_resource(subpath_tuple, params)
 
+    def entity(self, data):
+        """ Wraps data into the entity_class of the resource, or into its
+        compact_entity_class if the Discogs instance is compact.
+        """
+        if self.discogs.compact and self.compact_entity_class:
+            return self.compact_entity_class(self, data)
+        return self.entity_class(self, data)
+
+    def get_many(self, ids, concurrency=4, ordered=False,
+                 fatal=(RateLimitExceeded,)):
+        """ Fetches the entity of each id through the get(id) method of the
+        resource, with up to concurrency requests at the same time.
+        It returns a BulkResult: iterate over it to get the entities, as they
+        complete or, if ordered is True, in the same order of ids. The ids
+        that failed are reported in its errors dict, except for the errors
+        of the fatal classes, which stop the iteration.
+        All the requests go through the Discogs instance, sharing its
+        connection pool and its rate limiting: by default, a limiter that
+        doesn't block stops the iteration with RateLimitExceeded, instead
+        of failing each of the remaining ids.
+
+        >>> from discogsapi import Discogs
+        >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
+        >>> result = discogs.releases.get_many([45, 46], ordered=True)
+        >>> [release.id for release in result]
+        [45, 46]
+        >>> result.errors
+        {}
+        """
+        if not hasattr(self, 'get'):
+            raise ResourceException("%s has no get method" %
+                                    self.__class__.__name__)
+        return BulkResult(self.get, ids, concurrency, ordered, fatal)
+
 if __name__ == "__main__":
     import doctest
     doctest.testmod()
@@ -0,0 +1,287 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+""" Module for the compact entity classes.
+    A compact entity is a __slots__ based struct with a slot for each known
+    field of the Discogs data, plus an overflow dict for unknown keys. It has
+    no __dict__, so it takes a fraction of the memory of an EntityResource.
+    Nested lists of the data (tracklist, images, extraartists...) are decoded
+    into compact structs too. Compact entities are used when a Discogs
+    instance is created with compact=True.
+"""
+
+from discogsapi.resource.database.image import Image, ImageResource
+
+
+class StructMetaclass(type):
+    """ Creates the __slots__ of a Struct class from its fields. A field
+    with the same name of a class attribute (e.g. a property) is stored in
+    the _<field>_data slot, as EntityResource does with such keys.
+    """
+    def __new__(cls, name, bases, dct):
+        slots_by_key = {}
+        nested = {}
+        for base in reversed(bases):
+            slots_by_key.update(getattr(base, '_slots_by_key', {}))
+            nested.update(getattr(base, 'nested', {}))
+        nested.update(dct.get('nested', {}))
+        slots = []
+        for field in dct.get('fields', ()):
+            slot = "_%s_data" % field if field in dct else field
+            slots_by_key[field] = slot
+            slots.append(slot)
+        dct['__slots__'] = tuple(slots) + tuple(dct.get('__slots__', ()))
+        dct['_slots_by_key'] = slots_by_key
+        dct['nested'] = nested
+        return super(StructMetaclass, cls).__new__(cls, name, bases, dct)
+
+
+def decode(struct_class, value, resource=None):
+    """ Decodes a dict, or the dicts of a list, into struct_class instances.
+    """
+    if isinstance(value, dict):
+        return struct_class(resource, value)
+    if isinstance(value, list):
+        return [struct_class(resource, i) if isinstance(i, dict) else i
+                for i in value]
+    return value
+
+
+class Struct(object):
+    """ Base class for the compact structs. The fields tuple lists the
+    known keys and the nested dict maps keys to the Struct class their
+    values are decoded into. Unknown keys go to the _extra dict. Besides
+    attributes, the values can be read as items, like the dicts they come
+    from.
+
+    >>> class Track(Struct):
+    ...     fields = ('position', 'title')
+    >>> track = Track(None, {'position': 'A1', 'title': 'Digeridoo',
+    ...                      'duration': '7:14'})
+    >>> track.title, track['position'], track.duration
+    ('Digeridoo', 'A1', '7:14')
+    >>> hasattr(track, '__dict__')
+    False
+    """
+    __metaclass__ = StructMetaclass
+    __slots__ = ('_extra',)
+    fields = ()
+    nested = {}
+
+    def __init__(self, resource, data=None):
+        if 'resource' in self._slots_by_key:
+            self.resource = resource
+        extra = None
+        slots_by_key = self._slots_by_key
+        nested = self.nested
+        for key, value in (data or {}).iteritems():
+            slot = slots_by_key.get(key)
+            if slot is None:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+                continue
+            if key in nested:
+                value = decode(nested[key], value, resource)
+            setattr(self, slot, value)
+        self._extra = extra
+
+    def __getattr__(self, name):
+        if name != '_extra':
+            extra = self._extra
+            if extra and name in extra:
+                return extra[name]
+        raise AttributeError("'%s' object has no attribute '%s'" %
+                             (self.__class__.__name__, name))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self._slots_by_key.get(key, key))
+        except AttributeError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.get(key, self) is not self
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __repr__(self):
+        return "<%s>" % self.__class__.__name__
+
+
+class ArtistCredit(Struct):
+    fields = ('id', 'name', 'anv', 'join', 'role', 'tracks', 'active',
+              'resource_url', 'thumbnail_url')
+
+
+class LabelCredit(Struct):
+    fields = ('id', 'name', 'catno', 'entity_type', 'entity_type_name',
+              'resource_url')
+
+
+class Format(Struct):
+    fields = ('name', 'qty', 'descriptions', 'text')
+
+
+class Identifier(Struct):
+    fields = ('type', 'value', 'description')
+
+
+class Video(Struct):
+    fields = ('uri', 'title', 'description', 'duration', 'embed')
+
+
+class Track(Struct):
+    fields = ('position', 'type_', 'title', 'duration', 'artists',
+              'extraartists', 'sub_tracks')
+    nested = {'artists': ArtistCredit, 'extraartists': ArtistCredit}
+
+Track.nested['sub_tracks'] = Track
+
+
+class CompactImage(Struct):
+    """ The data of an image. Its Image entity, to download the image, is
+    the image attribute.
+    """
+    fields = ('resource', 'type', 'uri', 'uri150', 'resource_url', 'width',
+              'height')
+    __slots__ = ('_image',)
+
+    @property
+    def filename(self):
+        return self.resource_url.split('/')[-1]
+
+    @property
+    def image(self):
+        try:
+            return self._image
+        except AttributeError:
+            imgr = self.resource.discogs.get_resource(ImageResource)
+            data = dict((key, self[key]) for key in self.fields[1:]
+                        if key in self)
+            self._image = Image(imgr, data=data)
+            return self._image
+
+
+class CompactEntity(Struct):
+    """ Base class for the compact entities, with the same representation
+    of the EntityResources.
+    """
+    fields = ('resource', 'id', 'resource_url', 'uri', 'data_quality')
+
+    def __unicode__(self):
+        return u'EntityResource: %s' % self.resource.name
+
+    def __str__(self):
+        return self.__unicode__().encode('utf-8')
+
+    def __repr__(self):
+        return "<%s>" % self.__str__()
+
+
+class CompactRelease(CompactEntity):
+    """ Compact version of the Release entity, also used for the items of
+    the Releases generator.
+    """
+    fields = ('title', 'year', 'status', 'thumb', 'country', 'released',
+              'released_formatted', 'notes', 'master_id', 'master_url',
+              'artists', 'extraartists', 'labels', 'companies', 'formats',
+              'genres', 'styles', 'tracklist', 'images', 'videos',
+              'identifiers', 'series', 'community', 'date_added',
+              'date_changed', 'num_for_sale', 'lowest_price',
+              'estimated_weight', 'format_quantity', 'artists_sort', 'type',
+              'main_release', 'artist', 'role', 'label', 'format', 'catno')
+    nested = {'artists': ArtistCredit, 'extraartists': ArtistCredit,
+              'labels': LabelCredit, 'companies': LabelCredit,
+              'series': LabelCredit, 'formats': Format, 'tracklist': Track,
+              'images': CompactImage, 'videos': Video,
+              'identifiers': Identifier}
+
+    __slots__ = ('_thumb',)
+
+    @property
+    def thumb(self):
+        try:
+            return self._thumb
+        except AttributeError:
+            if not self._thumb_data:
+                self._thumb = None
+                return None
+            imgr = self.resource.discogs.get_resource(ImageResource)
+            data = {'resource_url': self._thumb_data}
+            self._thumb = Image(imgr, data=data)
+            return self._thumb
+
+    def __unicode__(self):
+        return u'Release: %s' % self.title
+
+
+class CompactMaster(CompactEntity):
+    """ Compact version of the Master entity.
+    """
+    fields = ('title', 'year', 'main_release', 'main_release_url',
+              'most_recent_release', 'most_recent_release_url',
+              'versions_url', 'artists', 'genres', 'styles', 'tracklist',
+              'images', 'videos', 'num_for_sale', 'lowest_price', 'notes')
+    nested = {'artists': ArtistCredit, 'tracklist': Track,
+              'images': CompactImage, 'videos': Video}
+
+    def __unicode__(self):
+        return u'Master: %s' % self.title
+
+
+class CompactArtist(CompactEntity):
+    """ Compact version of the Artist entity.
+    """
+    fields = ('name', 'realname', 'profile', 'urls', 'namevariations',
+              'aliases', 'members', 'groups', 'images', 'releases_url')
+    nested = {'aliases': ArtistCredit, 'members': ArtistCredit,
+              'groups': ArtistCredit, 'images': CompactImage}
+
+    @property
+    def images(self):
+        return [i.image for i in self._images_data]
+
+    def __unicode__(self):
+        return u'Artist: %s' % self.name
+
+    def releases(self, **kwargs):
+        """ Retrieves the artist's releases, see Artist.releases.
+        """
+        from discogsapi.resource.database.artist import ArtistsResource
+        artists_resource = self.resource.discogs.get_resource(ArtistsResource)
+        return artists_resource.get_releases(self.id, **kwargs)
+
+
+class CompactLabel(CompactEntity):
+    """ Compact version of the Label entity.
+    """
+    fields = ('name', 'profile', 'contact_info', 'urls', 'sublabels',
+              'parent_label', 'images', 'releases_url')
+    nested = {'sublabels': LabelCredit, 'parent_label': LabelCredit,
+              'images': CompactImage}
+
+    def __unicode__(self):
+        return u'Label: %s' % self.name
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
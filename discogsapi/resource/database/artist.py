@@ -20,6 +20,7 @@
 from discogsapi.resource.base import Resource
 from discogsapi.resource.entity import EntityResource
 from discogsapi.category.categories import Database
+from discogsapi.resource.compact import CompactArtist
 from discogsapi.resource.database.release import Releases
 from discogsapi.resource.database.image import Image, ImageResource
 
@@ -30,16 +31,23 @@ class Artist(EntityResource):
     def __unicode__(self):
         return u'Artist: %s' % self.name
 
-    def __init__(self, *args, **kwargs):
-        super(Artist, self).__init__(*args, **kwargs)
-        imgr = ImageResource(self.resource.discogs)
-        self.images = [Image(imgr, data=i) for i in self.images]
-
-    def releases(self):
+    @property
+    def images(self):
+        """ The artist's images, as Image entities, created on first
+        access.
+        """
+        images = self.__dict__.get('_images')
+        if images is None:
+            imgr = self.resource.discogs.get_resource(ImageResource)
+            images = [Image(imgr, data=i) for i in self._images_data]
+            self._images = images
+        return images
+
+    def releases(self, **kwargs):
         """ Retrieves an EntityResourceGenerator containing the artist's
         releases, wrapped as Artist EntityResource.
         NOTE: This method returns just the result of get_releases method of
-        the ArtistsResource class.
+        the ArtistsResource class, see its arguments there.
 
         >>> from discogsapi import Discogs
         >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
@@ -49,7 +57,8 @@ class Artist(EntityResource):
         >>> artist.releases()
         <Releases Generator: [<Release: Analog Bubblebath Vol 2>, <Release: Analogue Bubblebath>, <Release: Digeridoo>, '...']>
         """
-        return ArtistsResource(self.resource.discogs).get_releases(self.id)
+        artists_resource = self.resource.discogs.get_resource(ArtistsResource)
+        return artists_resource.get_releases(self.id, **kwargs)
 
 
 class ArtistsResource(Resource):
@@ -57,6 +66,8 @@ class ArtistsResource(Resource):
     """
     name = "artists"
     category = Database
+    entity_class = Artist
+    compact_entity_class = CompactArtist
 
     def __unicode__(self):
         return u'<Artists Resource>'
@@ -73,12 +84,25 @@ class ArtistsResource(Resource):
         >>> artist.namevariations
         ['A-F-X Twin', 'A.F.X.', 'A.Twin', 'AFX', 'Apex Twin', 'Aphex Twin, The', 'Aphex Twins', 'TheAphexTwin']
         """
-        data = self.get_data(45)
-        return Artist(self, data)
+        data = self.get_data(id)
+        return self.entity(data)
 
-    def get_releases(self, id):
+    def get_releases(self, id, prefetch=None, keep=False, per_page=None):
         """ Returns artist's releases, an EntityResourceGenerator with Releases
-        EntityResources.
+        EntityResources. With prefetch > 0 the next pages are fetched in
+        background, up to prefetch pages ahead. With keep=True the consumed
+        pages are kept, so the generator can be rewound. per_page sets the
+        number of releases of each page requested.
+        The generator also supports len() and indexing or slicing, which
+        request only the pages needed:
+
+        >>> from discogsapi import Discogs
+        >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
+        >>> releases = discogs.artists.get_releases(45, per_page=20)
+        >>> len(releases) > 100
+        True
+        >>> len(releases[100:120])
+        20
 
         >>> from discogsapi import Discogs
         >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
@@ -86,7 +110,8 @@ class ArtistsResource(Resource):
         >>> artists_resource.get_releases(45)
         <Releases Generator: [<Release: Analog Bubblebath Vol 2>, <Release: Analogue Bubblebath>, <Release: Digeridoo>, '...']>
         """
-        return Releases(self, id, "releases")
+        return Releases(self, id, "releases", prefetch=prefetch, keep=keep,
+                        per_page=per_page)
 
 if __name__ == "__main__":
     import doctest
@@ -20,6 +20,7 @@
 from discogsapi.resource.base import Resource
 from discogsapi.resource.entity import EntityResource
 from discogsapi.category.categories import Database
+from discogsapi.resource.compact import CompactLabel
 
 
 class Label(EntityResource):
@@ -43,6 +44,8 @@ class LabelsResource(Resource):
     """
     name = "labels"
     category = Database
+    entity_class = Label
+    compact_entity_class = CompactLabel
 
     def __unicode__(self):
         return u'<Labels Resource>'
@@ -56,8 +59,8 @@ class LabelsResource(Resource):
         >>> labels_resource.get(45)
         <Label: Groovin' Records>
         """
-        data = self.get_data(45)
-        return Label(self, data)
+        data = self.get_data(id)
+        return self.entity(data)
 
 
 if __name__ == "__main__":
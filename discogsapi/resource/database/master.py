@@ -20,6 +20,7 @@
 from discogsapi.resource.base import Resource
 from discogsapi.resource.entity import EntityResource
 from discogsapi.category.categories import Database
+from discogsapi.resource.compact import CompactMaster
 
 
 class Master(EntityResource):
@@ -42,6 +43,8 @@ class MastersResource(Resource):
     """
     name = "masters"
     category = Database
+    entity_class = Master
+    compact_entity_class = CompactMaster
 
     def __unicode__(self):
         return u'<Masters Resource>'
@@ -55,8 +58,8 @@ class MastersResource(Resource):
         >>> masters_resource.get(8471)
         <Master: Back In Black>
         """
-        data = self.get_data(8471)
-        return Master(self, data)
+        data = self.get_data(id)
+        return self.entity(data)
 
 if __name__ == "__main__":
     import doctest
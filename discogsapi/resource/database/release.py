@@ -20,6 +20,7 @@
 from discogsapi.resource.base import Resource
 from discogsapi.resource.entity import EntityResource, EntityResourceGenerator
 from discogsapi.category.categories import Database
+from discogsapi.resource.compact import CompactRelease
 from discogsapi.resource.database.image import Image, ImageResource
 
 class Release(EntityResource):
@@ -34,11 +35,17 @@ class Release(EntityResource):
     <Release: Push Along EP>
     """
 
-    def __init__(self, *args, **kwargs):
-        super(Release, self).__init__(*args, **kwargs)
-        imgr = ImageResource(self.resource.discogs)
-        data = {'resource_url': self.thumb}
-        self.thumb = Image(imgr, data=data)
+    @property
+    def thumb(self):
+        """ The release's thumbnail, as an Image entity, created on first
+        access, or None if the release has none.
+        """
+        thumb = self.__dict__.get('_thumb')
+        if thumb is None and self._thumb_data:
+            imgr = self.resource.discogs.get_resource(ImageResource)
+            data = {'resource_url': self._thumb_data}
+            thumb = self._thumb = Image(imgr, data=data)
+        return thumb
 
     def __unicode__(self):
         return u'Release: %s' % self.title
@@ -56,6 +63,7 @@ class Releases(EntityResourceGenerator):
     <Releases Generator: [<Release: Analog Bubblebath Vol 2>, <Release: Analogue Bubblebath>, <Release: Digeridoo>, '...']>
     """
     item_class = Release
+    compact_item_class = CompactRelease
 
 
 class ReleasesResource(Resource):
@@ -63,6 +71,8 @@ class ReleasesResource(Resource):
     """
     name = "releases"
     category = Database
+    entity_class = Release
+    compact_entity_class = CompactRelease
 
     def __unicode__(self):
         return u'<Releases Resource>'
@@ -77,7 +87,7 @@ class ReleasesResource(Resource):
         <Release: Push Along EP>
         """
         data = self.get_data(id)
-        return Release(self, data)
+        return self.entity(data)
 
 if __name__ == "__main__":
     import doctest
@@ -19,8 +19,14 @@
 """
 
 import os
+import threading
+import time
+from collections import OrderedDict
+from urllib2 import HTTPError
 
+from discogsapi.files import atomic_file
 from discogsapi.ratelimit import RateLimit
+from discogsapi.prefetch import PagePrefetcher
 
 
 class EntityResourceException(Exception):
@@ -51,11 +57,27 @@ class EntityResource(object):
 
     def __init__(self, resource, data=None):
         self.resource = resource
-        for key, value in data.items():
-            if hasattr(self, key):
-                setattr(self, "_%s_data" % key, value)
-            else:
-                setattr(self, key, value)
+        self._data = data if data else {}
+
+    def __getattr__(self, name):
+        """ The attributes are materialized from the data on first access,
+        then kept in the instance. A key of the data with the same name of
+        a class attribute (e.g. a method) is available as _<key>_data.
+        """
+        data = self.__dict__.get('_data')
+        key = name
+        if data is not None and key not in data and \
+           name.startswith('_') and name.endswith('_data'):
+            key = name[1:-5]
+        if data is None or key not in data:
+            raise AttributeError("'%s' object has no attribute '%s'" %
+                                 (self.__class__.__name__, name))
+        value = self.__dict__[name] = data[key]
+        return value
+
+    def __dir__(self):
+        names = set(dir(self.__class__)) | set(self.__dict__)
+        return sorted(names | set(self.__dict__.get('_data', ())))
 
     def __unicode__(self):
         return u'EntityResource: %s' % self.resource.name
@@ -120,27 +142,101 @@ class EntityResourceGeneratorPagination(EntityResource):
                                          self.pages, self.per_page, self.items)
 
 
-class EntityResourceGenerator:
+class EntityResourceGenerator(object):
     """ A generator for a list of resources.
     Since a list of resources may be paginated, this generator will call the
-    next page only if needed.
+    next page only if needed. Nothing is requested until the generator is
+    used, e.g. iterated or printed.
+    With prefetch > 0, the upcoming pages are fetched in a background thread,
+    up to prefetch pages ahead, while the current page is being consumed.
+    When prefetch is None, the prefetch attribute of the Discogs instance is
+    used. The prefetching stops when the generator is exhausted, closed or
+    garbage collected.
+    By default only the entities of the current page are kept in entities,
+    each page being discarded once consumed, so the memory used doesn't
+    grow with the number of items. With keep=True all the entities are kept,
+    and rewind replays them from the start. Otherwise rewind requests the
+    pages again.
+    Besides the iteration, len(generator) returns the total of items, and
+    generator[i] or generator[a:b] request only the pages containing the
+    items, using the page and per_page params. per_page defaults to the one
+    of the Discogs API (50); when it is given, no request is needed to know
+    which page holds an item. The last pages accessed this way are cached.
+    A generator can be shared by many threads: each item is returned by next
+    to a single thread.
     """
     item_class = None
+    compact_item_class = None
+    PAGE_CACHE_SIZE = 4
 
-    def __init__(self, resource, id, key_list=None, subpath=None):
+    def __init__(self, resource, id, key_list=None, subpath=None,
+                 prefetch=None, keep=False, per_page=None):
+        self._lock = threading.RLock()
         self.resource = resource
         self.key_list = key_list
+        self.keep = keep
+        self.per_page = per_page
         self.index = 0
         self.entities = []
+        if prefetch is None:
+            prefetch = resource.discogs.prefetch
+        self.prefetch = prefetch
+        self._prefetcher = None
+        self._started = False
+        self._pages = OrderedDict()
         if not self.item_class:
             raise EntityResourceException('item_class must be set in the '
                                           'subclass of and EntityResource')
         if not subpath:
             subpath = key_list
-        data = self.resource.get_data((id, subpath))
-        self._set_data(data)
+        self._subpath_tuple = (id, subpath)
+
+    def __getattr__(self, name):
+        """ The attributes coming from the data (e.g. pagination) are only
+        available once the first page is requested, which happens here.
+        """
+        if name.startswith('_') or self.__dict__.get('_started', True):
+            raise AttributeError("'%s' object has no attribute '%s'" %
+                                 (self.__class__.__name__, name))
+        self._start()
+        return getattr(self, name)
+
+    def _params(self, page=None):
+        params = {}
+        if page is not None:
+            params['page'] = page
+        if self.per_page:
+            params['per_page'] = self.per_page
+        return params
+
+    def _start(self):
+        """ Requests the first page, and starts the prefetching if needed.
+        """
+        if self._started:
+            return
+        with self._lock:
+            if self._started:
+                return
+            data = self.resource.get_data(self._subpath_tuple,
+                                          self._params())
+            self._set_data(data)
+            # the first page is cached for the indexing, unless it was
+            # paginated differently
+            pag = self.data.get('pagination') or {}
+            if pag.get('page') and (not self.per_page or
+                                    pag.get('per_page') == self.per_page):
+                self._pages[pag['page']] = list(self.entities)
+            next = self.pagination.urls.get('next')
+            if next and self.prefetch > 0:
+                self._prefetcher = PagePrefetcher(self.resource.discogs,
+                                                  next, self.prefetch)
+            self._started = True
+
+    def __del__(self):
+        self.close()
 
     def __unicode__(self):
+        self._start()
         entities = self.entities[:3] + ['...']
         return u'%s Generator: %s' % (self.__class__.__name__, entities)
 
@@ -155,6 +251,69 @@ class EntityResourceGenerator:
         """
         return self
 
+    def __len__(self):
+        return self.pagination.items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.start, index.stop, index.step
+            if (start is not None and start < 0) or stop is None or \
+               stop < 0 or (step is not None and step < 0):
+                start, stop, step = index.indices(len(self))
+            items = []
+            for i in xrange(start or 0, stop, step or 1):
+                try:
+                    items.append(self._item(i))
+                except IndexError:
+                    break
+            return items
+        if index < 0:
+            index += len(self)
+        if index < 0:
+            raise IndexError('%s index out of range' %
+                             self.__class__.__name__)
+        return self._item(index)
+
+    def _item(self, index):
+        per_page = self.per_page or self.pagination.per_page
+        page, offset = divmod(index, per_page)
+        entities = self._page(page + 1)
+        if offset >= len(entities):
+            raise IndexError('%s index out of range' %
+                             self.__class__.__name__)
+        return entities[offset]
+
+    def _page(self, page):
+        """ Returns the entities of the given page, from the page cache or
+        requested with the page param.
+        """
+        with self._lock:
+            return self._locked_page(page)
+
+    def _locked_page(self, page):
+        entities = self._pages.pop(page, None)
+        if entities is None:
+            if self._started and page > self.pagination.pages:
+                return []
+            try:
+                data = self.resource.get_data(self._subpath_tuple,
+                                              self._params(page))
+            except HTTPError, err:
+                if err.code == 404:
+                    return []
+                raise
+            entities = self._entities(data.get(self.key_list) or [])
+        self._pages[page] = entities
+        while len(self._pages) > self.PAGE_CACHE_SIZE:
+            self._pages.popitem(last=False)
+        return entities
+
+    def _entities(self, alist):
+        item_class = self.item_class
+        if self.compact_item_class and self.resource.discogs.compact:
+            item_class = self.compact_item_class
+        return [item_class(self.resource, i) for i in alist]
+
     def _set_data(self, data):
         """ Receives a dict data previously parsed through a JSON string and
         sets the data and creates a list of EntityResources.
@@ -163,39 +322,91 @@ class EntityResourceGenerator:
         pag = self.data.get('pagination')
         self.pagination = EntityResourceGeneratorPagination(self.resource,
                                                             data=pag)
-        self.data.pop('pagination')
         for key, value in self.data.items():
-            setattr(self, key, value)
-        alist = self.data.get(self.key_list)
-        c = lambda r, d: self.item_class(r, data=d)
-        self.entities += [c(self.resource, i) for i in alist]
+            if key != 'pagination':
+                setattr(self, key, value)
+        entities = self._entities(self.data.get(self.key_list))
+        if self.keep:
+            self.entities += entities
+        else:
+            self.entities = entities
+            self.index = 0
 
     def next(self):
         """ This method take care of call the 'next' url of the pagination
         only if reaches the end of the current page.
         """
-        if self.index >= len(self.entities):
-            next = self.pagination.urls.get('next')
-            if not next:
-                raise StopIteration
-            data = self.resource.discogs.get_data_from_full_url(next)
+        self._start()
+        with self._lock:
+            return self._next()
+
+    def _next(self):
+        while self.index >= len(self.entities):
+            if self._prefetcher:
+                try:
+                    data = self._prefetcher.get()
+                except:
+                    self.close()
+                    raise
+                if data is None:
+                    self.close()
+                    raise StopIteration
+            else:
+                next = self.pagination.urls.get('next')
+                if not next:
+                    raise StopIteration
+                data = self.resource.discogs.get_data_from_full_url(next)
             self._set_data(data)
         item = self.entities[self.index]
         self.index += 1
         return item
 
+    def rewind(self):
+        """ Restarts the iteration from the first entity. With keep=True the
+        kept entities are replayed, otherwise the consumed pages were
+        discarded, and they are requested again from the first one.
+        """
+        with self._lock:
+            self.index = 0
+            if not self.keep:
+                self.close()
+                self.entities = []
+                self._started = False
+
+    def close(self):
+        """ Stops the background prefetching of pages, if any.
+        """
+        prefetcher = getattr(self, '_prefetcher', None)
+        if prefetcher:
+            prefetcher.stop()
+            self._prefetcher = None
+
 
 class ImageEntityResource(object):
     """ Base class for an Image EntityResource. It has an attribute for the
     response of the image.
+    The image can be streamed through iter_content, or saved with save,
+    without holding the whole image in memory. After a download,
+    downloaded_bytes, download_seconds and bytes_per_second report how it
+    went.
+    The response and content can be read from many threads, but a response
+    can only be streamed by one of them, through iter_content or save.
     """
 
+    CHUNK_SIZE = 64 * 1024
+
     def __init__(self, resource, filename=None, data=None):
+        self._lock = threading.RLock()
         self.resource = resource
         self.filename = filename
         self._response = None
         self._content = None
+        self.downloaded_bytes = 0
+        self.download_seconds = 0.0
         data = data if data else {}
+        if data and not data.get('resource_url'):
+            raise EntityImageException("The image data has no resource_url: "
+                                       "%s" % data)
         for key, value in data.items():
             setattr(self, key, value)
         if data:
@@ -210,22 +421,64 @@ class ImageEntityResource(object):
     @property
     def response(self):
         if not self._response:
-            self._response = self.resource.get_response(self.filename)
-            RateLimit.test_limit_and_increment()
+            with self._lock:
+                if not self._response:
+                    self._response = self.resource.get_response(
+                        self.filename)
+                    RateLimit.test_limit_and_increment()
         return self._response
 
     @property
     def content(self):
         if not self._content:
-            self._content = self.response.read()
+            with self._lock:
+                if not self._content:
+                    self._content = ''.join(self.iter_content())
         return self._content
 
-    def save(self, path):
+    @property
+    def bytes_per_second(self):
+        if not self.download_seconds:
+            return 0.0
+        return self.downloaded_bytes / self.download_seconds
+
+    def iter_content(self, chunk_size=None):
+        """ Yields the image data in chunks of up to chunk_size bytes, read
+        straight from the response. The response can be streamed only once,
+        unless content was read before.
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        if self._content:
+            for i in xrange(0, len(self._content), chunk_size):
+                yield self._content[i:i + chunk_size]
+            return
+        response = self.response
+        self.downloaded_bytes = 0
+        started = time.time()
+        while True:
+            chunk = response.read(chunk_size)
+            if not chunk:
+                break
+            self.downloaded_bytes += len(chunk)
+            self.download_seconds = time.time() - started
+            yield chunk
+
+    def save(self, path, chunk_size=None, progress=None):
+        """ Streams the image into a file named filename, in the directory
+        path, and returns the file path. The data is written to a temporary
+        file, renamed at the end, so the file is never left half written.
+        If given, progress is called after each chunk with the number of
+        bytes downloaded so far and the bytes per second.
+        """
         if not os.path.isdir(path):
             raise EntityImageException("No such directory %s" % path)
-        afile = open(os.path.join(path, self.filename), 'w')
-        afile.write(self.content)
-        afile.close()
+        filepath = os.path.join(path, self.filename)
+        with atomic_file(filepath) as afile:
+            for chunk in self.iter_content(chunk_size):
+                afile.write(chunk)
+                if progress:
+                    progress(self.downloaded_bytes, self.bytes_per_second)
+        return filepath
 
 if __name__ == "__main__":
     import doctest
@@ -27,7 +27,7 @@ class User(EntityResource):
     def __unicode__(self):
         return u'User: %s' % self.username
 
-    def inventory_listings(self):
+    def inventory_listings(self, **kwargs):
         """ Retrieves an EntityResourceGenerator containing the user's
         details.
 
@@ -47,8 +47,9 @@ class User(EntityResource):
         >>> user.username
         'example'
         """
-        users_resources = UsersResource(self.resource.discogs)
-        return users_resources.get_inventory_listings(self.username)
+        users_resources = self.resource.discogs.get_resource(UsersResource)
+        return users_resources.get_inventory_listings(self.username,
+                                                      **kwargs)
 
 
 class UsersResource(Resource):
@@ -75,9 +76,13 @@ class UsersResource(Resource):
         data = self.get_data(username)
         return User(self, data)
 
-    def get_inventory_listings(self, username):
+    def get_inventory_listings(self, username, prefetch=None, keep=False,
+                               per_page=None):
         """ Returns artist's releases, an EntityResourceGenerator with Releases
-        EntityResources.
+        EntityResources. With prefetch > 0 the next pages are fetched in
+        background, up to prefetch pages ahead. With keep=True the consumed
+        pages are kept, so the generator can be rewound. per_page sets the
+        number of listings of each page requested.
 
         >>> from discogsapi import Discogs
         >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
@@ -85,7 +90,9 @@ class UsersResource(Resource):
         >>> users_resource.get_inventory_listings('example')
         <InventoryListings Generator: ['...']>
         """
-        return InventoryListings(self, username, 'listings', 'inventory')
+        return InventoryListings(self, username, 'listings', 'inventory',
+                                 prefetch=prefetch, keep=keep,
+                                 per_page=per_page)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,113 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+""" Module for the retry policy of DiscogsBase.
+    Requests failing with a transient error, a 429 (Too Many Requests) or
+    5xx response or a network error, are sent again after an exponential
+    backoff with jitter, or after the delay asked by the Retry-After header
+    of the response.
+"""
+
+import httplib
+import random
+import socket
+import time
+
+
+def parse_retry_after(value):
+    """ Returns the seconds to wait given by a Retry-After header, either a
+    number of seconds or an HTTP date, or None if it can't be parsed.
+
+    >>> parse_retry_after('120')
+    120.0
+    >>> parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') < 0
+    True
+    >>> parse_retry_after('soon') is None
+    True
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    # imported here, the email package is slow to import
+    from email.utils import parsedate_tz, mktime_tz
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return mktime_tz(date) - time.time()
+
+
+class Retry(object):
+    """ The retry policy of a Discogs instance (the retry argument).
+    A request is sent at most total times more, waiting
+    backoff * 2 ** attempt seconds before each new attempt, up to
+    max_backoff. With jitter, the wait is a random time up to that, so many
+    clients don't retry all at the same time. The Retry-After header of a
+    response, when present, gives the wait instead.
+    budget caps the seconds a call may take including its retries: a retry
+    which would end past the budget isn't made, and the last response or
+    error is returned to the caller, so the tail latency stays bounded.
+
+    >>> retry = Retry(total=2, backoff=1, jitter=False)
+    >>> retry.delay(0, time.time()), retry.delay(1, time.time())
+    (1, 2)
+    >>> retry.delay(2, time.time()) is None
+    True
+    >>> retry.delay(0, time.time(), retry_after='3')
+    3.0
+    >>> retry.delay(0, time.time() - 59, retry_after='3') is None
+    True
+    >>> Retry(total=0).delay(0, time.time()) is None
+    True
+    """
+
+    STATUSES = (429, 500, 502, 503, 504)
+    ERRORS = (socket.error, httplib.HTTPException)
+    TOO_MANY_REQUESTS = 429
+
+    def __init__(self, total=3, backoff=0.5, max_backoff=30, budget=60,
+                 statuses=None, jitter=True):
+        self.total = total
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = budget
+        self.statuses = tuple(statuses or self.STATUSES)
+        self.jitter = jitter
+
+    def delay(self, attempt, started, retry_after=None):
+        """ Returns the seconds to wait before the retry number attempt + 1
+        of a call started at the timestamp started, or None if it shouldn't
+        be retried.
+        """
+        if attempt >= self.total:
+            return None
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            if self.jitter:
+                delay = random.uniform(0, delay)
+        delay = max(delay, 0)
+        if self.budget is not None and \
+           time.time() - started + delay > self.budget:
+            return None
+        return delay
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()
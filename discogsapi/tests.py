@@ -15,12 +15,79 @@
 # along with this program. If not, see <http://www.gnu.org/licenses/>.
 
 import doctest
+import gc
+import gzip
+import httplib
+import itertools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from StringIO import StringIO
 from unittest import TestCase
+from urllib2 import HTTPError
 
+from discogsapi.asyncdiscogs import AsyncDiscogs
+from discogsapi.base import DiscogsBase
+from discogsapi.cache import CacheEntry, MemoryCache, SQLiteCache
+from discogsapi.connection import ConnectionPool, PooledResponse
 from discogsapi.discogs import Discogs
+from discogsapi.dumps import DumpException, DumpReader
+from discogsapi.files import UMASK
+from discogsapi.metrics import MetricsAggregator
+from discogsapi.mirror import ImageMirror
+from discogsapi.ratelimit import RateLimit, RateLimitExceeded, \
+                                 SharedRateLimiter, TokenBucket
+from discogsapi.retry import Retry
+from discogsapi.resource.compact import ArtistCredit, CompactArtist, \
+                                       CompactRelease, Track
 from discogsapi.resource.database.artist import Artist
+from discogsapi.resource.database.image import Image
+from discogsapi.resource.database.release import Release
+from discogsapi.resource.entity import EntityImageException
+from discogsapi.transport import CassetteTransport, MemoryTransport, \
+                                 Response, TransportException
 
-doctest.testfile('../README.md', optionflags=doctest.ELLIPSIS)
+# The responses of the Discogs API are replayed from the cassette, so the
+# tests run offline and never write into the package. Set
+# DISCOGS_CASSETTE_MODE=record to record them again from the live API.
+CASSETTE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                        'cassettes', 'tests.json')
+DiscogsBase.default_transport = CassetteTransport(
+    CASSETTE, mode=os.environ.get('DISCOGS_CASSETTE_MODE', 'replay'))
+
+
+
+def private_rate_limit():
+    """ Counts the image downloads in a counter of this test run, instead of
+    the one shared by the processes of the machine, whose daily quota the
+    tests would use up. Returns the lock file to restore.
+    """
+    lock_file = RateLimit.RATE_LIMIT_LOCK_FILE
+    RateLimit.RATE_LIMIT_LOCK_FILE = 'discogs_tests_%d.counter' % os.getpid()
+    return lock_file
+
+
+def shared_rate_limit(lock_file):
+    """ Removes the counter of the test run and restores lock_file.
+    """
+    path = os.path.join(tempfile.gettempdir(), RateLimit.RATE_LIMIT_LOCK_FILE)
+    limiter = RateLimit._limiters.pop(path, None)
+    if limiter is not None:
+        limiter.close()
+    if os.path.exists(path):
+        os.remove(path)
+    RateLimit.RATE_LIMIT_LOCK_FILE = lock_file
+
+
+LOCK_FILE = private_rate_limit()
+try:
+    doctest.testfile('../README.md', optionflags=doctest.ELLIPSIS)
+finally:
+    shared_rate_limit(LOCK_FILE)
 
 
 class DatabaseTestCase(TestCase):
@@ -44,6 +111,971 @@ class DatabaseTestCase(TestCase):
         self.assertTrue(hasattr(release, 'title'))
 
 
+class TransportTestCase(TestCase):
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.transport.add('/artists/45', {'id': 45, 'name': 'Aphex Twin'})
+        for page in (1, 2):
+            next = {'next': '/artists/45/releases?page=2'} if page == 1 \
+                   else {}
+            self.transport.add('/artists/45/releases%s' %
+                               ('?page=2' if page == 2 else ''), {
+                'pagination': {'page': page, 'pages': 2, 'items': 3,
+                               'per_page': 2, 'urls': next},
+                'releases': [{'id': page * 10 + i, 'title': 'R%s' % i}
+                             for i in range(3 - page)],
+            })
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                               transport=self.transport)
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_memory_transport(self):
+        artist = self.discogs.artists.get(45)
+        self.assertEquals(artist.name, 'Aphex Twin')
+        releases = list(self.discogs.artists.get_releases('45'))
+        self.assertEquals([i.id for i in releases], [10, 11, 20])
+        self.assertRaises(HTTPError, self.discogs.releases.get, 1)
+        self.assertEquals(len(self.transport.requests), 4)
+
+    def test_cassette_transport(self):
+        path = os.path.join(self.tmp, 'cassette.json')
+        recorder = CassetteTransport(path, transport=self.transport)
+        discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          transport=recorder)
+        self.assertEquals(discogs.artists.get(45).name, 'Aphex Twin')
+        self.assertEquals(recorder.recorded, 1)
+        self.assertEquals(os.stat(path).st_mode & 0777, 0666 & ~UMASK)
+        self.assertEquals(os.listdir(self.tmp), ['cassette.json'])
+
+        player = CassetteTransport(path, mode='replay')
+        discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          transport=player)
+        self.assertEquals(discogs.artists.get(45).name, 'Aphex Twin')
+        self.assertEquals(player.played, 1)
+        self.assertRaises(TransportException, discogs.artists.get, 46)
+
+    def test_hooks(self):
+        events = []
+        metrics = MetricsAggregator()
+        self.discogs.add_hook(events.append)
+        self.discogs.add_hook(metrics)
+        self.discogs.artists.get(45)
+        self.assertRaises(HTTPError, self.discogs.releases.get, 1)
+        self.assertEquals([(i.resource, i.status) for i in events],
+                          [('artists', 200), ('releases', 404)])
+        self.assertIsInstance(events[1].error, HTTPError)
+        stats = metrics.stats()
+        self.assertEquals(stats['artists']['requests'], 1)
+        self.assertEquals(stats['releases']['errors'], 1)
+        self.assertIn('discogs_requests_total{resource="artists"} 1',
+                      metrics.dump())
+
+
+class FakeSocket(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def makefile(self, *args, **kwargs):
+        return StringIO(self.data)
+
+
+class ConnectionTestCase(TestCase):
+
+    BODY = '{"id": 45, "name": "Aphex Twin", "releases": []}' * 20
+
+    def compress(self, encoding):
+        if encoding == 'gzip':
+            afile = StringIO()
+            with gzip.GzipFile(fileobj=afile, mode='wb') as gzipped:
+                gzipped.write(self.BODY)
+            return afile.getvalue()
+        if encoding == 'deflate':
+            return zlib.compress(self.BODY)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        return compressor.compress(self.BODY) + compressor.flush()
+
+    def response(self, encoding):
+        body = self.compress(encoding)
+        encoding = 'deflate' if encoding == 'raw' else encoding
+        response = httplib.HTTPResponse(FakeSocket(
+            "HTTP/1.1 200 OK\r\nContent-Encoding: %s\r\n"
+            "Content-Length: %s\r\n\r\n%s" % (encoding, len(body), body)))
+        response.begin()
+        return PooledResponse(ConnectionPool(), None, None, response,
+                              'http://api.discogs.com/artists/45')
+
+    def read(self, response, amt):
+        chunks = []
+        while True:
+            chunk = response.read(amt)
+            if not chunk:
+                return ''.join(chunks)
+            self.assertTrue(len(chunk) <= amt)
+            chunks.append(chunk)
+
+    def test_lines(self):
+        self.BODY = ''.join('line %s\n' % i for i in range(1000))
+        for encoding in ('gzip', 'deflate', 'raw', 'memory'):
+            if encoding == 'memory':
+                response = Response(200, self.BODY)
+            else:
+                response = self.response(encoding)
+            self.assertEquals(response.code, 200)
+            self.assertEquals(response.readline(), 'line 0\n')
+            self.assertEquals(response.read(3), 'lin')
+            self.assertEquals(response.readline(), 'e 1\n')
+            self.assertEquals(response.readline(3), 'lin')
+            self.assertEquals(response.readline(), 'e 2\n')
+            self.assertEquals(response.readlines(20),
+                              ['line 3\n', 'line 4\n', 'line 5\n'])
+            self.assertEquals(response.next(), 'line 6\n')
+            lines = list(response)
+            self.assertEquals(len(lines), 993)
+            self.assertEquals(lines[-1], 'line 999\n')
+            self.assertEquals(response.readline(), '')
+            self.assertEquals(response.read(), '')
+            self.assertEquals(response.decoded_bytes, len(self.BODY))
+
+    def test_decompression(self):
+        for encoding in ('gzip', 'deflate', 'raw'):
+            response = self.response(encoding)
+            self.assertEquals(response.read(), self.BODY)
+            self.assertEquals(response.read(), '')
+            self.assertEquals(response.read(10), '')
+            for amt in (1, 7, 4096):
+                response = self.response(encoding)
+                self.assertEquals(self.read(response, amt), self.BODY)
+                self.assertEquals(response.read(amt), '')
+                self.assertEquals(response.read(), '')
+            self.assertEquals(response.decoded_bytes, len(self.BODY))
+            self.assertEquals(response.wire_bytes,
+                              len(self.compress(encoding)))
+
+
+class BrokenResponse(Response):
+    """ Fails after the first chunk of the body.
+    """
+
+    def read(self, amt=None):
+        if self.wire_bytes:
+            raise IOError("Connection reset by peer")
+        return super(BrokenResponse, self).read(amt)
+
+
+class ImageTestCase(TestCase):
+
+    FILENAME = 'R-150-63114-1148806222.jpeg'
+    DATA = ''.join(chr(i % 256) for i in range(1000))
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.transport.add('/image/%s' % self.FILENAME, self.DATA,
+                           headers={'Content-Type': 'image/jpeg'})
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                               transport=self.transport)
+        self.tmp = tempfile.mkdtemp()
+        self.lock_file = private_rate_limit()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+        shared_rate_limit(self.lock_file)
+
+    def test_iter_content(self):
+        image = self.discogs.images.get(self.FILENAME)
+        chunks = list(image.iter_content(300))
+        self.assertEquals([len(i) for i in chunks], [300, 300, 300, 100])
+        self.assertEquals(''.join(chunks), self.DATA)
+        self.assertEquals(image.downloaded_bytes, 1000)
+        image = self.discogs.images.get(self.FILENAME)
+        self.assertEquals(image.content, self.DATA)
+        self.assertEquals(''.join(image.iter_content(300)), self.DATA)
+        self.assertEquals(len(self.transport.requests), 2)
+        self.assertEquals(RateLimit.get_current_rate_limit_data()[2], 2)
+
+    def test_save(self):
+        progress = []
+        image = self.discogs.images.get(self.FILENAME)
+        path = image.save(self.tmp, chunk_size=400,
+                          progress=lambda *args: progress.append(args[0]))
+        self.assertEquals(path, os.path.join(self.tmp, self.FILENAME))
+        self.assertEquals(open(path, 'rb').read(), self.DATA)
+        self.assertEquals(progress, [400, 800, 1000])
+        self.assertEquals(os.stat(path).st_mode & 0777, 0666 & ~UMASK)
+        self.assertEquals(os.listdir(self.tmp), [self.FILENAME])
+
+    def test_save_error(self):
+        image = self.discogs.images.get(self.FILENAME)
+        image._response = BrokenResponse(200, self.DATA)
+        self.assertRaises(IOError, image.save, self.tmp, chunk_size=400)
+        self.assertEquals(os.listdir(self.tmp), [])
+
+
+class GeneratorTestCase(TestCase):
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                               transport=self.transport)
+
+    def add_pages(self, pages, per_page=2):
+        """ Adds the releases of 45, pages being the number of releases of
+        each page.
+        """
+        items = sum(pages)
+        for page, count in enumerate(pages, 1):
+            urls = {}
+            if page < len(pages):
+                urls['next'] = '/artists/45/releases?page=%s' % (page + 1)
+            first = sum(pages[:page - 1])
+            data = {
+                'pagination': {'page': page, 'pages': len(pages),
+                               'items': items, 'per_page': per_page,
+                               'urls': urls},
+                'releases': [{'id': i, 'title': 'R%s' % i}
+                             for i in range(first, first + count)],
+            }
+            self.transport.add('/artists/45/releases?page=%s' % page, data)
+            if page == 1:
+                self.transport.add('/artists/45/releases', data)
+
+    def urls(self):
+        return [i[1].split('/releases')[1] for i in self.transport.requests]
+
+    def test_indexing(self):
+        self.add_pages([2, 2, 1])
+        releases = self.discogs.artists.get_releases(45)
+        self.assertEquals(len(releases), 5)
+        self.assertEquals(releases[0].id, 0)
+        self.assertEquals(releases[1].id, 1)
+        self.assertEquals(self.urls(), [''])
+        self.assertEquals(releases[-1].id, 4)
+        self.assertEquals(releases[-5].id, 0)
+        self.assertEquals(self.urls(), ['', '?page=3'])
+        self.assertEquals([i.id for i in releases[1:5:2]], [1, 3])
+        self.assertEquals([i.id for i in releases[::-2]], [4, 2, 0])
+        self.assertEquals([i.id for i in releases[3:10]], [3, 4])
+        self.assertEquals(releases[5:], [])
+        self.assertEquals(self.urls(), ['', '?page=3', '?page=2'])
+        self.assertRaises(IndexError, releases.__getitem__, 5)
+        self.assertRaises(IndexError, releases.__getitem__, -6)
+        self.assertEquals(len(self.transport.requests), 3)
+
+    def test_window(self):
+        self.add_pages([2, 2, 2])
+        releases = self.discogs.artists.get_releases(45)
+        ids = []
+        for release in releases:
+            ids.append(release.id)
+            self.assertTrue(len(releases.entities) <= 2)
+        self.assertEquals(ids, range(6))
+        releases.rewind()
+        self.assertEquals([i.id for i in releases], range(6))
+        self.assertEquals(self.urls(), ['', '?page=2', '?page=3'] * 2)
+
+    def test_keep(self):
+        self.add_pages([2, 2, 2])
+        releases = self.discogs.artists.get_releases(45, keep=True)
+        self.assertEquals([i.id for i in releases], range(6))
+        self.assertEquals(len(releases.entities), 6)
+        releases.rewind()
+        self.assertEquals([i.id for i in releases], range(6))
+        self.assertEquals(len(self.transport.requests), 3)
+
+    def test_empty_page(self):
+        self.add_pages([2, 0, 2])
+        releases = self.discogs.artists.get_releases(45)
+        self.assertEquals([i.id for i in releases], range(4))
+        self.assertEquals(self.urls(), ['', '?page=2', '?page=3'])
+
+    def wait_requests(self, count):
+        started = time.time()
+        while len(self.transport.requests) < count and \
+              time.time() - started < 5:
+            time.sleep(0.01)
+
+    def test_prefetch(self):
+        self.add_pages([2, 2, 2])
+        releases = self.discogs.artists.get_releases(45, prefetch=1)
+        self.assertEquals(releases.next().id, 0)
+        self.wait_requests(2)
+        self.assertEquals(self.urls()[:2], ['', '?page=2'])
+        self.assertEquals([i.id for i in releases.entities], [0, 1])
+        self.assertEquals([i.id for i in releases], range(1, 6))
+        self.assertEquals(self.urls(), ['', '?page=2', '?page=3'])
+        self.assertIsNone(releases._prefetcher)
+
+    def test_prefetch_error(self):
+        self.add_pages([2, 2, 2])
+        self.transport.add('/artists/45/releases?page=2', {}, status=404)
+        releases = self.discogs.artists.get_releases(45, prefetch=2)
+        self.assertEquals([releases.next().id, releases.next().id], [0, 1])
+        self.assertRaises(HTTPError, releases.next)
+        self.assertIsNone(releases._prefetcher)
+
+    def test_prefetch_stop(self):
+        self.add_pages([2] * 5)
+        releases = self.discogs.artists.get_releases(45, prefetch=1)
+        releases.next()
+        thread = releases._prefetcher.thread
+        self.wait_requests(3)
+        releases.close()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEquals(len(self.transport.requests), 3)
+
+        releases = self.discogs.artists.get_releases(45, prefetch=1)
+        releases.next()
+        thread = releases._prefetcher.thread
+        del releases
+        gc.collect()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+
+
+class ConcurrencyTransport(MemoryTransport):
+    """ Answers the artists of any id, counting the concurrent requests.
+    """
+
+    def __init__(self):
+        super(ConcurrencyTransport, self).__init__()
+        self.active = self.max_active = 0
+
+    def urlopen(self, method, url, headers=None):
+        with self._lock:
+            self.requests.append((method, url, headers or {}))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self._lock:
+            self.active -= 1
+        id = int(url.split('/')[-1])
+        return Response(200, json.dumps({'id': id, 'name': 'A%s' % id}),
+                        {'Content-Type': 'application/json'}, url=url)
+
+
+class BulkTestCase(TestCase):
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        for id in (1, 2, 3, 5, 6):
+            self.transport.add('/artists/%s' % id, {'id': id,
+                                                    'name': 'A%s' % id})
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                               transport=self.transport)
+
+    def test_ordered(self):
+        result = self.discogs.artists.get_many(range(1, 7), concurrency=3,
+                                               ordered=True)
+        self.assertEquals([i.id for i in result], [1, 2, 3, 5, 6])
+        self.assertEquals(result.errors.keys(), [4])
+        self.assertIsInstance(result.errors[4], HTTPError)
+
+    def test_unordered(self):
+        result = self.discogs.artists.get_many(range(1, 7), concurrency=3)
+        self.assertEquals(sorted(i.id for i in result), [1, 2, 3, 5, 6])
+        self.assertEquals(result.errors.keys(), [4])
+
+    def test_concurrency(self):
+        transport = ConcurrencyTransport()
+        discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          transport=transport)
+        consumed = []
+        ids = (consumed.append(i) or i for i in itertools.count(1))
+        entities = iter(discogs.artists.get_many(ids, concurrency=2))
+        self.assertEquals(len([entities.next() for i in range(10)]), 10)
+        entities.close()
+        self.assertTrue(transport.max_active <= 2)
+        self.assertTrue(len(consumed) <= 10 + 2 * 2)
+
+    def test_rate_limit(self):
+        transport = ConcurrencyTransport()
+        discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          transport=transport,
+                          rate_limiter=TokenBucket(5, 60, block=False))
+        result = discogs.artists.get_many(range(1, 201), concurrency=2)
+        entities = []
+        with self.assertRaises(RateLimitExceeded):
+            for entity in result:
+                entities.append(entity)
+        self.assertTrue(len(entities) <= 5)
+        self.assertEquals(result.errors, {})
+        self.assertEquals(len(transport.requests), 5)
+        result = discogs.artists.get_many(range(1, 11), fatal=())
+        self.assertEquals(list(result), [])
+        self.assertEquals(len(result.errors), 10)
+
+    def test_get_id(self):
+        self.transport.add('/labels/2', {'id': 2, 'name': 'L2'})
+        self.transport.add('/masters/3', {'id': 3, 'title': 'M3'})
+        self.assertEquals(self.discogs.artists.get(5).id, 5)
+        self.assertEquals(self.discogs.labels.get(2).id, 2)
+        self.assertEquals(self.discogs.masters.get(3).id, 3)
+        self.assertEquals([i[1] for i in self.transport.requests], [
+            'http://api.discogs.com/artists/5',
+            'http://api.discogs.com/labels/2',
+            'http://api.discogs.com/masters/3'])
+
+
+class AsyncTestCase(TestCase):
+
+    def test_gather(self):
+        transport = ConcurrencyTransport()
+        with AsyncDiscogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          workers=5, transport=transport) as discogs:
+            results = [discogs.artists.get(id) for id in range(1, 6)]
+            artists = discogs.gather(results)
+        self.assertEquals([i.id for i in artists], range(1, 6))
+        self.assertTrue(transport.max_active > 1)
+
+    def test_generator(self):
+        transport = MemoryTransport()
+        transport.add('/artists/45/releases', {
+            'pagination': {'page': 1, 'pages': 1, 'items': 1,
+                           'per_page': 50, 'urls': {}},
+            'releases': [{'id': 1, 'title': 'R1'}]})
+        with AsyncDiscogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          transport=transport) as discogs:
+            releases = discogs.artists.get_releases(45).get(5)
+            self.assertEquals(len(transport.requests), 1)
+            self.assertEquals([i.id for i in releases], [1])
+            self.assertEquals(len(transport.requests), 1)
+
+
+class EntityTestCase(TestCase):
+
+    def setUp(self):
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                               transport=MemoryTransport())
+
+    def test_attributes(self):
+        artist = Artist(self.discogs.artists, {'id': 45,
+                                               'name': 'Aphex Twin'})
+        self.assertNotIn('name', artist.__dict__)
+        self.assertEquals(artist.name, 'Aphex Twin')
+        self.assertEquals(artist.__dict__['name'], 'Aphex Twin')
+        self.assertIn('id', dir(artist))
+        self.assertEquals(getattr(artist, 'realname', None), None)
+
+    def test_collisions(self):
+        images = [{'uri': '', 'resource_url': 'http://api.discogs.com'
+                                              '/image/A-45-1.jpeg'}]
+        artist = Artist(self.discogs.artists, {'id': 45, 'images': images,
+                                               'releases': 'a list'})
+        self.assertEquals(artist._releases_data, 'a list')
+        self.assertTrue(callable(artist.releases))
+        self.assertEquals(artist._images_data, images)
+        self.assertEquals([i.filename for i in artist.images],
+                          ['A-45-1.jpeg'])
+
+    def test_missing(self):
+        artist = Artist(self.discogs.artists, {'id': 45})
+        self.assertRaises(AttributeError, getattr, artist, 'name')
+        self.assertRaises(AttributeError, getattr, artist, '_name_data')
+        self.assertRaises(AttributeError, getattr, artist, '_id')
+        artist = Artist(self.discogs.artists)
+        self.assertRaises(AttributeError, getattr, artist, 'id')
+
+
+class CompactTestCase(TestCase):
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                               transport=self.transport, compact=True)
+
+    def test_nested(self):
+        release = CompactRelease(self.discogs.releases, {
+            'id': 45, 'title': 'Push Along EP', 'tracklist': [
+                {'position': 'A', 'title': 'Push Along',
+                 'artists': [{'id': 1, 'name': 'Lyric'}],
+                 'sub_tracks': [{'position': 'A1', 'title': 'Edit'}]}]})
+        track = release.tracklist[0]
+        self.assertIsInstance(track, Track)
+        self.assertIsInstance(track.artists[0], ArtistCredit)
+        self.assertEquals(track.artists[0].name, 'Lyric')
+        self.assertEquals(track.sub_tracks[0]['title'], 'Edit')
+        self.assertEquals(unicode(release), u'Release: Push Along EP')
+
+    def test_missing(self):
+        track = Track(None, {'title': 'Digeridoo', 'bpm': 120})
+        self.assertEquals(track.bpm, 120)
+        self.assertRaises(AttributeError, getattr, track, 'position')
+        self.assertRaises(KeyError, track.__getitem__, 'position')
+        self.assertEquals(track.get('position', 'A1'), 'A1')
+        self.assertNotIn('position', track)
+        self.assertIn('bpm', track)
+
+    def test_slots(self):
+        track = Track(None, {'title': 'Digeridoo'})
+        self.assertFalse(hasattr(track, '__dict__'))
+        track.title = 'Flap Head'
+        self.assertRaises(AttributeError, setattr, track, 'bpm', 120)
+
+    def test_generator(self):
+        self.transport.add('/artists/45', {'id': 45, 'name': 'Aphex Twin'})
+        self.transport.add('/artists/45/releases', {
+            'pagination': {'page': 1, 'pages': 1, 'items': 2,
+                           'per_page': 50, 'urls': {}},
+            'releases': [{'id': 1, 'title': 'R1', 'role': 'Main'},
+                         {'id': 2, 'title': 'R2', 'role': 'Main'}]})
+        self.assertIsInstance(self.discogs.artists.get(45), CompactArtist)
+        releases = list(self.discogs.artists.get_releases(45))
+        self.assertEquals([type(i) for i in releases], [CompactRelease] * 2)
+        self.assertEquals([i.role for i in releases], ['Main', 'Main'])
+
+
+class MirrorTestCase(TestCase):
+
+    def setUp(self):
+        self.transport = MemoryTransport()
+        self.transport.add('/image/A.jpeg', 'a' * 100)
+        self.transport.add('/image/B.jpeg', 'b' * 200)
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                               transport=self.transport)
+        self.tmp = tempfile.mkdtemp()
+        self.items = [{'resource_url': 'http://api.discogs.com/image/%s' % i}
+                      for i in ('A.jpeg', 'B.jpeg', 'A.jpeg', 'C.jpeg')]
+        self.lock_file = private_rate_limit()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+        shared_rate_limit(self.lock_file)
+
+    def test_mirror(self):
+        mirror = ImageMirror(self.discogs, self.tmp, concurrency=2)
+        stats = mirror.mirror([self.items[:2], self.items[2:]])
+        self.assertEquals(stats, dict(downloaded=2, skipped=0, failed=1,
+                                      bytes=300))
+        self.assertEquals(mirror.errors.keys(), ['C.jpeg'])
+        self.assertIsInstance(mirror.errors['C.jpeg'], HTTPError)
+        self.assertEquals(len(self.transport.requests), 3)
+        self.assertEquals(sorted(os.listdir(self.tmp)),
+                          [ImageMirror.MANIFEST, 'A.jpeg', 'B.jpeg'])
+        with open(mirror.manifest) as manifest:
+            self.assertEquals(sorted(manifest),
+                              ['A.jpeg\t100\n', 'B.jpeg\t200\n'])
+
+    def test_resume(self):
+        ImageMirror(self.discogs, self.tmp).mirror(self.items)
+        with open(os.path.join(self.tmp, 'B.jpeg'), 'w') as afile:
+            afile.write('b' * 10)
+        with open(os.path.join(self.tmp, ImageMirror.MANIFEST), 'a') as afile:
+            afile.write('C.jpe')
+        del self.transport.requests[:]
+        mirror = ImageMirror(self.discogs, self.tmp)
+        self.assertEquals(mirror.sizes, {'A.jpeg': 100, 'B.jpeg': 200})
+        stats = mirror.mirror(self.items)
+        self.assertEquals(stats, dict(downloaded=1, skipped=1, failed=1,
+                                      bytes=200))
+        self.assertEquals(sorted(i[1] for i in self.transport.requests), [
+            'http://api.discogs.com/image/B.jpeg',
+            'http://api.discogs.com/image/C.jpeg'])
+        with open(os.path.join(self.tmp, 'B.jpeg')) as afile:
+            self.assertEquals(afile.read(), 'b' * 200)
+        mirror = ImageMirror(self.discogs, self.tmp)
+        self.assertEquals(mirror.sizes, {'A.jpeg': 100, 'B.jpeg': 200})
+
+
+class RateLimitTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_shared_limiter(self):
+        path = os.path.join(self.tmp, 'discogs.limit')
+        with SharedRateLimiter(path, limit=1, period=60, block=False) as one:
+            one.acquire()
+            with SharedRateLimiter(path, limit=1, period=60,
+                                   block=False) as other:
+                self.assertRaises(RateLimitExceeded, other.acquire)
+            self.assertIsNone(other._fd)
+        self.assertIsNone(one._fd)
+        one.close()
+
+    def test_rate_limit_data(self):
+        ip, date, count = RateLimit.get_current_rate_limit_data()
+        self.assertIsNone(ip)
+        self.assertTrue(count >= 0)
+
+
+class ConditionalTransport(MemoryTransport):
+    """ Answers 304 to the conditional requests matching the ETag of the
+    response.
+    """
+
+    def urlopen(self, method, url, headers=None):
+        response = super(ConditionalTransport, self).urlopen(method, url,
+                                                             headers)
+        etag = response.getheader('etag')
+        if etag and (headers or {}).get('If-None-Match') == etag:
+            return Response(304, '', {'ETag': etag}, url=url)
+        return response
+
+
+class CacheTestCase(TestCase):
+
+    LAST_MODIFIED = 'Sat, 17 Oct 2026 10:00:00 GMT'
+
+    def make_cache(self):
+        return MemoryCache()
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache = self.make_cache()
+        self.transport = ConditionalTransport()
+        self.add_artist('Aphex Twin', '"v1"')
+        self.transport.add('/marketplace/listings/1', {'id': 1})
+        self.transport.add('/labels/45', {'id': 45})
+        self.events = []
+        self.discogs = self.make_discogs()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def make_discogs(self, **kwargs):
+        return Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                       transport=self.transport, cache=self.cache,
+                       hooks=[self.events.append], **kwargs)
+
+    def add_artist(self, name, etag):
+        self.transport.add('/artists/45', {'id': 45, 'name': name},
+                           headers={'ETag': etag,
+                                    'Last-Modified': self.LAST_MODIFIED})
+
+    def expire(self, key):
+        entry = self.cache._get(key)
+        self.cache.set(key, CacheEntry(entry.body, time.time() - 1,
+                                       entry.etag, entry.last_modified))
+
+    def test_hit(self):
+        self.assertEquals(self.discogs.artists.get(45).name, 'Aphex Twin')
+        self.assertEquals(self.discogs.artists.get(45).name, 'Aphex Twin')
+        self.assertEquals(len(self.transport.requests), 1)
+        self.assertEquals([i.cache for i in self.events], ['miss', 'hit'])
+        self.assertEquals(self.cache.stats()['hits'], 1)
+        self.assertEquals(self.cache.stats()['misses'], 1)
+        self.assertEquals(len(self.cache), 1)
+
+    def test_revalidated(self):
+        self.discogs.artists.get(45)
+        self.expire('/artists/45')
+        self.assertEquals(self.discogs.artists.get(45).name, 'Aphex Twin')
+        headers = self.transport.requests[1][2]
+        self.assertEquals(headers['If-None-Match'], '"v1"')
+        self.assertEquals(headers['If-Modified-Since'], self.LAST_MODIFIED)
+        self.assertTrue(self.cache._get('/artists/45').fresh)
+        self.assertEquals([i.cache for i in self.events],
+                          ['miss', 'revalidated'])
+        stats = self.cache.stats()
+        self.assertEquals((stats['stale'], stats['revalidated']), (1, 1))
+        self.discogs.artists.get(45)
+        self.assertEquals(len(self.transport.requests), 2)
+
+    def test_changed(self):
+        self.discogs.artists.get(45)
+        self.expire('/artists/45')
+        self.add_artist('AFX', '"v2"')
+        self.assertEquals(self.discogs.artists.get(45).name, 'AFX')
+        self.assertEquals(self.transport.requests[1][2]['If-None-Match'],
+                          '"v1"')
+        entry = self.cache._get('/artists/45')
+        self.assertTrue(entry.fresh)
+        self.assertEquals(entry.etag, '"v2"')
+        stats = self.cache.stats()
+        self.assertEquals((stats['stale'], stats['revalidated']), (1, 0))
+        self.assertEquals(self.discogs.artists.get(45).name, 'AFX')
+        self.assertEquals(len(self.transport.requests), 2)
+
+    def test_ttls(self):
+        for i in range(2):
+            self.discogs.get_data('/marketplace/listings/1')
+        self.assertEquals(len(self.transport.requests), 2)
+        self.assertEquals(len(self.cache), 0)
+        started = time.time()
+        self.discogs.artists.get(45)
+        expires = self.cache._get('/artists/45').expires - started
+        self.assertTrue(24 * 60 * 60 - 5 < expires <= 24 * 60 * 60 + 5)
+
+        discogs = self.make_discogs(cache_ttls={'artists': 0, 'labels': 10})
+        del self.transport.requests[:]
+        for i in range(2):
+            discogs.artists.get(45)
+            discogs.labels.get(45)
+        self.assertEquals([i[1].split('/', 3)[3] for i in
+                           self.transport.requests],
+                          ['artists/45', 'labels/45', 'artists/45'])
+        expires = self.cache._get('/labels/45').expires - started
+        self.assertTrue(5 < expires <= 15)
+        self.assertEquals(len(self.cache), 2)
+
+
+class SQLiteCacheTestCase(CacheTestCase):
+
+    def make_cache(self):
+        return SQLiteCache(os.path.join(self.tmp, 'discogs.db'))
+
+
+class FlakyTransport(MemoryTransport):
+    """ Answers the first requests with the given statuses.
+    """
+
+    def __init__(self, statuses, headers=None):
+        super(FlakyTransport, self).__init__()
+        self.statuses = list(statuses)
+        self.headers = headers
+
+    def urlopen(self, method, url, headers=None):
+        if self.statuses:
+            self.requests.append((method, url, headers or {}))
+            return Response(self.statuses.pop(0), '{}', self.headers,
+                            url=url)
+        return super(FlakyTransport, self).urlopen(method, url, headers)
+
+
+class RetryTestCase(TestCase):
+
+    def discogs(self, transport, **kwargs):
+        transport.add('/artists/45', {'id': 45, 'name': 'Aphex Twin'})
+        return Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                       transport=transport, **kwargs)
+
+    def test_retry(self):
+        transport = FlakyTransport([502, 503])
+        discogs = self.discogs(transport, retry=Retry(backoff=0.01))
+        self.assertEquals(discogs.artists.get(45).name, 'Aphex Twin')
+        self.assertEquals(len(transport.requests), 3)
+
+    def test_retry_gives_up(self):
+        transport = FlakyTransport([500] * 5)
+        discogs = self.discogs(transport, retry=Retry(total=2, backoff=0.01))
+        self.assertRaises(HTTPError, discogs.artists.get, 45)
+        self.assertEquals(len(transport.requests), 3)
+        transport = FlakyTransport([500] * 5)
+        discogs = self.discogs(transport, retry=Retry(total=0))
+        self.assertRaises(HTTPError, discogs.artists.get, 45)
+        self.assertEquals(len(transport.requests), 1)
+
+    def test_retry_after(self):
+        transport = FlakyTransport([429], {'Retry-After': '10'})
+        discogs = self.discogs(transport, retry=Retry(budget=5))
+        self.assertRaises(HTTPError, discogs.artists.get, 45)
+        transport = FlakyTransport([429], {'Retry-After': '0'})
+        limiter = TokenBucket(100, period=1)
+        discogs = self.discogs(transport, rate_limiter=limiter)
+        self.assertEquals(discogs.artists.get(45).name, 'Aphex Twin')
+        self.assertEquals(len(transport.requests), 2)
+
+
+class SlowTransport(MemoryTransport):
+
+    def urlopen(self, method, url, headers=None):
+        time.sleep(0.1)
+        return super(SlowTransport, self).urlopen(method, url, headers)
+
+
+class CoalescingTestCase(TestCase):
+
+    def fetch(self, discogs, id, count=8):
+        results = []
+
+        def get():
+            try:
+                results.append(discogs.artists.get(id))
+            except HTTPError, err:
+                results.append(err)
+
+        threads = [threading.Thread(target=get) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_coalescing(self):
+        transport = SlowTransport({'/artists/45': {'name': 'Aphex Twin'}})
+        metrics = MetricsAggregator()
+        discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          transport=transport, hooks=[metrics])
+        artists = self.fetch(discogs, 45)
+        self.assertEquals([i.name for i in artists], ['Aphex Twin'] * 8)
+        self.assertEquals(len(transport.requests), 1)
+        self.assertEquals(metrics.stats()['artists']['coalesced'], 7)
+        errors = self.fetch(discogs, 46)
+        self.assertTrue(all(isinstance(i, HTTPError) for i in errors))
+        self.assertEquals(len(transport.requests), 2)
+
+    def test_no_coalescing(self):
+        transport = SlowTransport({'/artists/45': {'name': 'Aphex Twin'}})
+        discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          transport=transport, coalesce=False)
+        self.fetch(discogs, 45, count=3)
+        self.assertEquals(len(transport.requests), 3)
+
+
+class ThreadSafetyTestCase(TestCase):
+
+    def setUp(self):
+        transport = MemoryTransport()
+        for id in range(1, 21):
+            transport.add('/releases/%s' % id, {'id': id,
+                                                'title': 'Release %s' % id})
+        transport.add('/artists/45/releases', {
+            'pagination': {'page': 1, 'pages': 1, 'items': 100,
+                           'per_page': 100, 'urls': {}},
+            'releases': [{'id': i, 'title': 'R%s' % i} for i in range(100)],
+        })
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                               transport=transport)
+
+    def run_threads(self, target, count=10):
+        errors = []
+
+        def run(i):
+            try:
+                target(i)
+            except Exception, err:
+                errors.append(err)
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(errors, [])
+
+    def test_shared_resource(self):
+        resource = self.discogs.releases
+        results = {}
+
+        def get(i):
+            for id in range(1, 21):
+                release = resource.get(id)
+                self.assertEquals(release.title, 'Release %s' % id)
+                self.assertEquals(resource.data['id'], id)
+            results[i] = release
+
+        self.run_threads(get)
+        self.assertEquals(len(results), 10)
+
+    def test_shared_generator(self):
+        releases = self.discogs.artists.get_releases('45')
+        consumed = []
+
+        def consume(i):
+            for release in releases:
+                consumed.append(release.id)
+
+        self.run_threads(consume)
+        self.assertEquals(sorted(consumed), range(100))
+
+
+RELEASE_XML = """<release id="%(id)s" status="Accepted"><images><image \
+height="600" type="primary" uri="" uri150="" width="600"/></images><artists>\
+<artist><id>1</id><name>The Persuader</name><anv/><join/><role/><tracks/>\
+</artist></artists><title>Stockholm %(id)s</title><labels><label \
+catno="SK032" id="5" name="Svek"/></labels><formats><format name="Vinyl" \
+qty="2" text=""><descriptions><description>12"</description></descriptions>\
+</format></formats><genres><genre>Electronic</genre></genres><styles><style>\
+Deep House</style></styles><country>Sweden</country><released>1999-03-00\
+</released><master_id is_main_release="true">5427</master_id><tracklist>\
+<track><position>A</position><title>Ostermalm</title><duration>4:45\
+</duration></track></tracklist></release>"""
+
+
+ARTISTS_XML = """<artists><artist><images><image height="600" \
+type="primary" uri="http://s.discogs.com/image/A-1-1.jpeg" uri150="" \
+width="600"/><image height="600" type="secondary" uri="" uri150="" \
+width="600"/></images><id>1</id><name>The Persuader</name><namevariations>\
+<name>Persuader</name></namevariations></artist><artist><images><image \
+height="600" type="primary" uri="" uri150="" width="600"/></images><id>2\
+</id><name>Mr. James Barth &amp; A.D.</name></artist></artists>"""
+
+
+def count_releases(releases):
+    return sum(1 for release in releases)
+
+
+class DumpsTestCase(TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'releases.xml')
+        with open(self.path, 'w') as afile:
+            afile.write('<releases>')
+            for id in range(1, 101):
+                afile.write(RELEASE_XML % {'id': id})
+            afile.write('</releases>')
+        self.discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_releases(self):
+        releases = list(DumpReader(self.discogs, self.path))
+        self.assertEquals(len(releases), 100)
+        release = releases[0]
+        self.assertEquals(unicode(release), u'Release: Stockholm 1')
+        self.assertEquals(release.id, 1)
+        self.assertEquals(release.year, 1999)
+        self.assertEquals(release.master_id, 5427)
+        self.assertEquals(release.artists[0]['name'], 'The Persuader')
+        self.assertEquals(release.labels[0]['catno'], 'SK032')
+        self.assertEquals(release.formats[0]['descriptions'], ['12"'])
+        self.assertEquals(release.tracklist[0]['title'], 'Ostermalm')
+
+    def test_compact_gzipped(self):
+        path = self.path + '.gz'
+        with open(self.path) as source:
+            with gzip.open(path, 'wb') as afile:
+                afile.write(source.read())
+        discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                          compact=True)
+        reader = DumpReader(discogs, path)
+        releases = list(reader)
+        self.assertEquals(len(releases), 100)
+        self.assertEquals(releases[-1].title, 'Stockholm 100')
+        self.assertEquals(releases[-1].artists[0].name, 'The Persuader')
+        self.assertRaises(DumpException, reader.ranges, 2)
+
+    def test_artists_images(self):
+        path = os.path.join(self.tmp, 'artists.xml')
+        with open(path, 'w') as afile:
+            afile.write(ARTISTS_XML)
+        for compact in (False, True):
+            discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+                              compact=compact)
+            artists = list(DumpReader(discogs, path))
+            self.assertEquals([i.name for i in artists],
+                              ['The Persuader', 'Mr. James Barth & A.D.'])
+            self.assertEquals([i.filename for i in artists[0].images],
+                              ['A-1-1.jpeg'])
+            self.assertIsInstance(artists[0].images[0], Image)
+            self.assertEquals(artists[1].images, [])
+        artist = Artist(self.discogs.artists, {'id': 1, 'images': [
+            {'type': 'primary', 'uri': ''}]})
+        self.assertRaises(EntityImageException, getattr, artist, 'images')
+        release = Release(self.discogs.releases, {'id': 1, 'thumb': ''})
+        self.assertIsNone(release.thumb)
+
+    def test_split(self):
+        reader = DumpReader(self.discogs, self.path)
+        ranges = reader.ranges(7)
+        self.assertEquals(len(ranges), 7)
+        ids = [i.id for start, end in ranges
+               for i in reader.parse_range(start, end)]
+        self.assertEquals(ids, range(1, 101))
+        self.assertEquals(sum(reader.map(count_releases, processes=2)), 100)
+
+
 if __name__ == "__main__":
     from unittest import main
     main()
\ No newline at end of file
@@ -0,0 +1,339 @@
+# Discogs API, Python Wrapper - https://www.discogs.com/developers/index.html
+# Copyright (C) 2013 Rogerio Hilbert Lima <rogerhil@gmail.com>
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see <http://www.gnu.org/licenses/>.
+
+
+""" Module for the transports of DiscogsBase, the objects sending the HTTP
+    requests to the Discogs API.
+    A transport has an urlopen(method, url, headers) method returning a
+    file-like response (read, getheader, status, reason and msg), a clear
+    method releasing its connections and a transfer attribute, a
+    TransferStats. The default transport is the ConnectionPool of the
+    connection module. This module has two transports to run without the
+    network:
+      - MemoryTransport: serves responses added in memory
+      - CassetteTransport: records the responses of another transport in a
+                           cassette file, then replays them
+"""
+
+import base64
+import httplib
+import json
+import os
+import threading
+import urllib
+import urlparse
+from StringIO import StringIO
+
+from discogsapi.connection import ConnectionPool, TransferStats
+from discogsapi.files import atomic_file
+
+
+class TransportException(Exception):
+    pass
+
+
+def request_key(method, url):
+    """ Returns the key identifying a request: the method, the path and the
+    query string sorted by name. The scheme and host are left out, so the
+    same responses serve any base url.
+
+    >>> request_key('GET', 'http://api.discogs.com/artists/45/releases?per_page=50&page=2')
+    'GET /artists/45/releases?page=2&per_page=50'
+    >>> request_key('GET', '/artists/45')
+    'GET /artists/45'
+    """
+    parsed = urlparse.urlsplit(url)
+    key = "%s %s" % (method.upper(), parsed.path or '/')
+    if parsed.query:
+        query = sorted(urlparse.parse_qsl(parsed.query, True))
+        key = "%s?%s" % (key, urllib.urlencode(query))
+    return key
+
+
+class Response(object):
+    """ An in-memory response with the reading interface of the
+    PooledResponse of the connection module. headers is a list of
+    (name, value) tuples or a dict.
+
+    >>> response = Response(200, '{"id": 45}', {'Content-Type': 'application/json'})
+    >>> response.getheader('content-type')
+    'application/json'
+    >>> response.read(3), response.read()
+    ('{"i', 'd": 45}')
+    """
+
+    def __init__(self, status, body='', headers=None, reason=None, url=None,
+                 transfer=None):
+        self.status = self.code = status
+        self.reason = reason or httplib.responses.get(status, '')
+        if isinstance(headers, dict):
+            headers = headers.items()
+        self.header_items = [tuple(i) for i in headers or []]
+        lines = ''.join("%s: %s\r\n" % i for i in self.header_items)
+        self.msg = self.headers = httplib.HTTPMessage(StringIO(lines))
+        self.body = body
+        self.url = url
+        self.transfer = transfer
+        self.wire_bytes = 0
+        self.decoded_bytes = 0
+        self._file = StringIO(body)
+
+    def read(self, amt=None):
+        if amt is None:
+            data = self._file.read()
+        else:
+            data = self._file.read(amt)
+        return self._count(data)
+
+    def readline(self, limit=-1):
+        return self._count(self._file.readline(limit))
+
+    def readlines(self, sizehint=0):
+        return [self._count(i) for i in self._file.readlines(sizehint)]
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def _count(self, data):
+        self.wire_bytes += len(data)
+        self.decoded_bytes += len(data)
+        if self.transfer is not None:
+            self.transfer.add(len(data), len(data))
+        return data
+
+    def release(self):
+        pass
+
+    def close(self):
+        self._file.close()
+
+    def getheader(self, name, default=None):
+        return self.msg.getheader(name, default)
+
+    def getcode(self):
+        return self.status
+
+    def info(self):
+        return self.msg
+
+    def geturl(self):
+        return self.url
+
+
+class MemoryTransport(object):
+    """ A transport serving the responses added to it, without any network
+    access. The responses are matched by the path and query string of the
+    requests, see request_key. The requests without a response get a 404,
+    like the Discogs API does. Every request is logged in the requests
+    list, as (method, url, headers) tuples.
+
+    >>> transport = MemoryTransport()
+    >>> transport.add('/artists/45', {'id': 45, 'name': 'Aphex Twin'})
+    >>> from discogsapi import Discogs
+    >>> discogs = Discogs("HeyBaldock/1.0 +http://heybaldock.com.br",
+    ...                   transport=transport)
+    >>> discogs.artists.get(45).name
+    'Aphex Twin'
+    >>> discogs.artists.get(46)
+    Traceback (most recent call last):
+    ...
+    HTTPError: HTTP Error 404: Not Found
+    >>> [url for method, url, headers in transport.requests]
+    ['http://api.discogs.com/artists/45', 'http://api.discogs.com/artists/46']
+    """
+
+    NOT_FOUND = '{"message": "The requested resource was not found."}'
+
+    def __init__(self, responses=None):
+        """ responses is an optional dict of {url: data}, added with add.
+        """
+        self.transfer = TransferStats()
+        self.requests = []
+        self._responses = {}
+        self._lock = threading.Lock()
+        for url, data in (responses or {}).items():
+            self.add(url, data)
+
+    def add(self, url, data, status=200, headers=None, method='GET'):
+        """ Adds the response to the requests of url, a full url or a path
+        with its query string. data is the body, a string, or a dict or list
+        sent as JSON.
+        """
+        headers = dict(headers or {})
+        if not isinstance(data, basestring):
+            data = json.dumps(data)
+            headers.setdefault('Content-Type', 'application/json')
+        with self._lock:
+            self._responses[request_key(method, url)] = (status, data,
+                                                         headers)
+
+    def urlopen(self, method, url, headers=None):
+        with self._lock:
+            self.requests.append((method, url, headers or {}))
+            stored = self._responses.get(request_key(method, url))
+        if stored is None:
+            stored = (404, self.NOT_FOUND,
+                      {'Content-Type': 'application/json'})
+        status, body, response_headers = stored
+        return Response(status, body, response_headers, url=url,
+                        transfer=self.transfer)
+
+    def clear(self):
+        pass
+
+
+class CassetteTransport(object):
+    """ A transport recording the responses of another transport, by
+    default a ConnectionPool, in a cassette file, and replaying them.
+    The cassette is a JSON file, which can be committed along with the
+    tests so they run offline. The mode is one of:
+      - 'once': replays the recorded requests and records the new ones
+      - 'replay': only replays, a request not recorded raises a
+                  TransportException
+      - 'record': sends all the requests and records them again
+    The responses are recorded already decompressed, and matched by the
+    path and query string of the requests, see request_key.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'cassette.json')
+    >>> memory = MemoryTransport({'/labels/1': {'name': 'Planet E'}})
+    >>> cassette = CassetteTransport(path, transport=memory)
+    >>> cassette.urlopen('GET', 'http://api.discogs.com/labels/1').read()
+    '{"name": "Planet E"}'
+    >>> replay = CassetteTransport(path, mode='replay')
+    >>> replay.urlopen('GET', 'http://api.discogs.com/labels/1').read()
+    '{"name": "Planet E"}'
+    >>> replay.urlopen('GET', 'http://api.discogs.com/labels/2')
+    Traceback (most recent call last):
+    ...
+    TransportException: GET /labels/2 is not recorded in the cassette
+    >>> cassette.recorded, replay.played
+    (1, 1)
+    """
+
+    MODES = ('once', 'replay', 'record')
+    # Headers not valid for the recorded body, stored decompressed
+    SKIP_HEADERS = ('content-encoding', 'content-length',
+                    'transfer-encoding', 'connection', 'keep-alive')
+
+    def __init__(self, path, transport=None, mode='once'):
+        if mode not in self.MODES:
+            raise TransportException("Invalid mode %s, it must be one of "
+                                     "%s" % (mode, ', '.join(self.MODES)))
+        self.path = path
+        self.mode = mode
+        self._transport = transport
+        self.transfer = TransferStats()
+        self.recorded = 0
+        self.played = 0
+        self._interactions = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path) and mode != 'record':
+            self.load()
+
+    @property
+    def transport(self):
+        """ The transport recorded, created only when needed, so replaying
+        doesn't even open connections.
+        """
+        if self._transport is None:
+            self._transport = ConnectionPool()
+        return self._transport
+
+    def load(self):
+        with open(self.path) as afile:
+            interactions = json.load(afile)['interactions']
+        for interaction in interactions:
+            key = request_key(interaction['method'], interaction['url'])
+            self._interactions[key] = interaction
+
+    def save(self):
+        """ Writes the cassette to a temporary file renamed to path, so it
+        is never left half written.
+        """
+        interactions = sorted(self._interactions.values(),
+                              key=lambda i: (i['url'], i['method']))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with atomic_file(self.path, 'w') as afile:
+            json.dump({'interactions': interactions}, afile, indent=1,
+                      sort_keys=True)
+
+    def _response(self, interaction, url):
+        body = interaction['body']
+        if interaction.get('encoding') == 'base64':
+            body = base64.b64decode(body)
+        else:
+            body = body.encode('utf-8')
+        headers = [(name.encode('utf-8'), value.encode('utf-8'))
+                   for name, value in interaction['headers']]
+        return Response(interaction['status'], body, headers,
+                        interaction['reason'].encode('utf-8'), url,
+                        self.transfer)
+
+    def _record(self, method, url, headers):
+        response = self.transport.urlopen(method, url, headers)
+        try:
+            body = response.read()
+        finally:
+            response.close()
+        try:
+            text, encoding = body.decode('utf-8'), 'utf-8'
+        except UnicodeDecodeError:
+            text, encoding = base64.b64encode(body), 'base64'
+        return {
+            'method': method,
+            'url': url,
+            'status': response.status,
+            'reason': response.reason,
+            'headers': [[name, value] for name, value in
+                        response.msg.items()
+                        if name.lower() not in self.SKIP_HEADERS],
+            'body': text,
+            'encoding': encoding,
+        }
+
+    def urlopen(self, method, url, headers=None):
+        key = request_key(method, url)
+        with self._lock:
+            interaction = self._interactions.get(key)
+            if interaction is not None and self.mode != 'record':
+                self.played += 1
+                return self._response(interaction, url)
+            if self.mode == 'replay':
+                raise TransportException("%s is not recorded in the "
+                                         "cassette" % key)
+            interaction = self._record(method, url, headers)
+            self._interactions[key] = interaction
+            self.recorded += 1
+            self.save()
+        return self._response(interaction, url)
+
+    def clear(self):
+        if self._transport is not None:
+            self._transport.clear()
+
+
+if __name__ == "__main__":
+    import doctest
+    doctest.testmod()